@@ -1,20 +1,70 @@
-from flask import request
+from flask import Response, request, stream_with_context
 from flask_restx import Namespace, Resource, fields
 from app.api.inference.handler import (
     start_inference_by_model_uuid,
     get_inference_by_uuid,
     get_latest_inference_job,
     get_all_inference_job,
+    search_plate,
     delete_inference,
+    has_result_backend,
+    inference_progress_events,
+    inference_job_exists,
+    get_profile_path,
 )
 from app.constants import AppConstants as app_constants
+from app.constants import OutputModes
+from app.core.fingerprint import hash_file, save_and_hash
+from app.core.inference_results import to_columns
+from app.core.metrics import UPLOAD_BYTES
+from app.core.s3_utils import get_s3_file
+from app.core.upload_sessions import UploadSessionError, UploadSessionStore
+from datetime import datetime
 import os
 import uuid
 
+try:
+    import msgpack
+except ImportError:  # optional, only needed to serve application/x-msgpack
+    msgpack = None
+
 ns = Namespace("Inference", description="Inference operations")
 
+MAX_PAGE_SIZE = 500
+
 get_parser = ns.parser()
 get_parser.add_argument("uuid", type=str, required=True, help="The inference UUID")
+get_parser.add_argument(
+    "frame_start", location="args", type=int, help="Only detections from this frame"
+)
+get_parser.add_argument(
+    "frame_end", location="args", type=int, help="Only detections up to this frame"
+)
+get_parser.add_argument(
+    "min_confidence",
+    location="args",
+    type=float,
+    help="Only detections with at least this OCR confidence",
+)
+get_parser.add_argument(
+    "plate",
+    location="args",
+    type=str,
+    help="Only readings of this plate, ignoring case, separators and OCR confusions",
+)
+get_parser.add_argument(
+    "dedupe",
+    location="args",
+    type=bool,
+    default=False,
+    help="Only the most confident reading of each plate",
+)
+get_parser.add_argument(
+    "Accept",
+    location="headers",
+    type=str,
+    help="application/x-msgpack for a columnar msgpack response",
+)
 
 upload_parser = ns.parser()
 upload_parser.add_argument(
@@ -24,15 +74,168 @@ upload_parser.add_argument(
     required=True,
     help="File containing inference data",
 )
+upload_parser.add_argument(
+    "output_mode",
+    location="form",
+    type=str,
+    choices=OutputModes.ALL,
+    default=OutputModes.VIDEO,
+    help="video: annotated video, detections: plate readings only, "
+    "overlay: original video with a per-frame overlay sidecar",
+)
+upload_parser.add_argument(
+    "force",
+    location="form",
+    type=bool,
+    default=False,
+    help="Reprocess the video even if an identical completed inference exists",
+)
+upload_parser.add_argument(
+    "profile",
+    location="form",
+    type=bool,
+    default=False,
+    help="Run the job under cProfile and keep the profile, implies force",
+)
+
+force_parser = ns.parser()
+force_parser.add_argument(
+    "force",
+    location="args",
+    type=bool,
+    default=False,
+    help="Reprocess the video even if an identical completed inference exists",
+)
+
+upload_session_parser = ns.parser()
+upload_session_parser.add_argument(
+    "total_size",
+    location="args",
+    type=int,
+    required=False,
+    help="Size of the video in bytes",
+)
+upload_session_parser.add_argument(
+    "output_mode",
+    location="args",
+    type=str,
+    choices=OutputModes.ALL,
+    default=OutputModes.VIDEO,
+    help="Output mode of the inference job started on finalize",
+)
+upload_session_parser.add_argument(
+    "profile",
+    location="args",
+    type=bool,
+    default=False,
+    help="Run the job under cProfile and keep the profile, implies force",
+)
+
+upload_chunk_parser = ns.parser()
+upload_chunk_parser.add_argument(
+    "offset",
+    location="args",
+    type=int,
+    required=True,
+    help="Byte offset of the chunk, the number of bytes received so far",
+)
+upload_chunk_parser.add_argument(
+    "X-Chunk-SHA256",
+    location="headers",
+    type=str,
+    required=False,
+    help="Hex SHA-256 of the chunk body",
+)
+
+list_parser = ns.parser()
+list_parser.add_argument(
+    "limit",
+    location="args",
+    type=int,
+    default=50,
+    help=f"Page size, at most {MAX_PAGE_SIZE}",
+)
+list_parser.add_argument(
+    "cursor",
+    location="args",
+    type=str,
+    help="next_cursor of the previous page",
+)
+list_parser.add_argument(
+    "status", location="args", type=str, help="Only inferences with this status"
+)
+list_parser.add_argument(
+    "from",
+    location="args",
+    type=str,
+    help="Only inferences at or after this ISO datetime",
+)
+list_parser.add_argument(
+    "to", location="args", type=str, help="Only inferences before this ISO datetime"
+)
+
+profile_parser = ns.parser()
+profile_parser.add_argument(
+    "uuid", location="args", type=str, required=True, help="The inference UUID"
+)
+
+progress_parser = ns.parser()
+progress_parser.add_argument(
+    "uuid", location="args", type=str, required=True, help="The inference UUID"
+)
+
+search_parser = ns.parser()
+search_parser.add_argument(
+    "plate", location="args", type=str, required=True, help="Plate number to find"
+)
+search_parser.add_argument(
+    "limit",
+    location="args",
+    type=int,
+    default=100,
+    help=f"Maximum number of detections, at most {MAX_PAGE_SIZE}",
+)
+search_parser.add_argument(
+    "fuzzy",
+    location="args",
+    type=bool,
+    default=False,
+    help="Also match plates with OCR confusions such as 0/O, 1/I, 8/B and 5/S",
+)
+search_parser.add_argument(
+    "max_distance",
+    location="args",
+    type=int,
+    default=1,
+    help=f"Edit distance allowed by a fuzzy search, at most {app_constants.PLATE_INDEX_MAX_DISTANCE}",
+)
 
 delete_parser = ns.parser()
 delete_parser.add_argument("uuid", type=str, required=True, help="The inference UUID")
 
+
+def is_true(value):
+    return str(value).lower() in ("true", "1", "yes")
+
+
+MSGPACK_MIMETYPE = "application/x-msgpack"
+
+
+def wants_msgpack():
+    if msgpack is None:
+        return False
+    best = request.accept_mimetypes.best_match(["application/json", MSGPACK_MIMETYPE])
+    return best == MSGPACK_MIMETYPE
+
+
 inference_model = ns.model(
     "Inference",
     {
         "message": fields.String(description="Response message"),
         "uuid": fields.String(description="Inference UUID"),
+        "duplicate_of": fields.String(
+            description="UUID of the identical completed inference that was reused"
+        ),
     },
 )
 
@@ -45,6 +248,15 @@ inference_result_model = ns.model(
     },
 )
 
+upload_session_model = ns.model(
+    "UploadSession",
+    {
+        "upload_id": fields.String(description="Upload session ID"),
+        "offset": fields.Integer(description="Number of bytes received so far"),
+        "total_size": fields.Integer(description="Expected size of the video"),
+    },
+)
+
 latest_inference_result_model = ns.model(
     "LatestInferenceResult",
     {
@@ -60,14 +272,42 @@ class Inference(Resource):
     @ns.expect(get_parser)
     @ns.response(200, "Success", inference_result_model)
     def get(self):
-        """Get inference result by inference id"""
+        """Get inference result by inference id, optionally filtered"""
         inference_uuid = request.args.get("uuid")
-        resp = get_inference_by_uuid(inference_uuid)
+        detection_filters = {
+            "frame_start": request.args.get("frame_start", type=int),
+            "frame_end": request.args.get("frame_end", type=int),
+            "min_confidence": request.args.get("min_confidence", type=float),
+            "plate": request.args.get("plate"),
+            "dedupe": is_true(request.args.get("dedupe")) or None,
+        }
+        detection_filters = {
+            name: value
+            for name, value in detection_filters.items()
+            if value is not None
+        }
+        resp = get_inference_by_uuid(inference_uuid, detection_filters)
         inference_result = {
             "inference_uuid": inference_uuid,
             "status": resp.get("status"),
             "inference": resp.get("inference_result"),
         }
+        if wants_msgpack():
+            # columnar arrays pack far smaller and decode far faster than per-frame dicts
+            inference = inference_result["inference"]
+            if inference:
+                inference["plate_numbers_with_info"] = to_columns(
+                    inference.get("plate_numbers_with_info", [])
+                )
+            return Response(
+                msgpack.packb(
+                    {
+                        "message": "Inference Results retrieved successfully",
+                        "inference_result": inference_result,
+                    }
+                ),
+                mimetype=MSGPACK_MIMETYPE,
+            )
         return {
             "message": "Inference Results retrieved successfully",
             "inference_result": inference_result,
@@ -78,13 +318,27 @@ class Inference(Resource):
     def post(self):
         """Post an inference job"""
         file = request.files.get("inference_data")
+        output_mode = request.form.get("output_mode", OutputModes.VIDEO)
+        if output_mode not in OutputModes.ALL:
+            return {"message": f"Invalid output_mode: {output_mode}"}, 400
 
         if file:
             temp_uuid = str(uuid.uuid4())
             temp_file_path = f"{app_constants.VIDEO_DOWNLOAD_TEMP_DIR}/{temp_uuid}.mp4"
             os.makedirs(os.path.dirname(temp_file_path), exist_ok=True)
-            file.save(temp_file_path)
-            resp = start_inference_by_model_uuid(temp_uuid)
+            video_sha256 = save_and_hash(file.stream, temp_file_path)
+            UPLOAD_BYTES.labels(endpoint="inference").inc(
+                os.path.getsize(temp_file_path)
+            )
+            resp = start_inference_by_model_uuid(
+                temp_uuid,
+                {
+                    "output_mode": output_mode,
+                    "profile": is_true(request.form.get("profile")),
+                },
+                video_sha256=video_sha256,
+                force=is_true(request.form.get("force")),
+            )
             response_data = {
                 "message": "Inference job posted successfully",
                 "body": resp,
@@ -124,11 +378,201 @@ class InferenceData(Resource):  # Changed class name to inherit from Resource
 
 @ns.route("/all")
 class InferenceData(Resource):  # Changed class name to inherit from Resource
+    @ns.expect(list_parser)
     @ns.response(200, "Success", latest_inference_result_model)
     def get(self):
-        """Get the latest inference job result"""
-        resp = get_all_inference_job()
+        """Get a page of inference jobs, newest first"""
+        limit = request.args.get("limit", 50, type=int)
+        if not 0 < limit <= MAX_PAGE_SIZE:
+            return {"message": f"limit must be between 1 and {MAX_PAGE_SIZE}"}, 400
+        try:
+            start_datetime, end_datetime = (
+                datetime.fromisoformat(request.args[name])
+                if request.args.get(name)
+                else None
+                for name in ("from", "to")
+            )
+            resp = get_all_inference_job(
+                limit,
+                cursor=request.args.get("cursor"),
+                inference_status=request.args.get("status"),
+                start_datetime=start_datetime,
+                end_datetime=end_datetime,
+            )
+        except ValueError as e:
+            return {"message": str(e)}, 400
         return {
             "message": "Latest inference result retrieved successfully",
-            "inference_results": resp,
+            "inference_results": resp["inference_results"],
+            "next_cursor": resp["next_cursor"],
         }, 200
+
+
+@ns.route("/progress")
+class InferenceProgress(Resource):
+    @ns.expect(progress_parser)
+    @ns.response(200, "text/event-stream of progress events")
+    @ns.response(404, "Inference not found")
+    def get(self):
+        """Stream the progress of an inference job as Server-Sent Events"""
+        inference_uuid = request.args.get("uuid")
+        if not inference_uuid:
+            return {"message": "An inference UUID is required"}, 400
+        if not has_result_backend():
+            return {"message": "Progress requires CELERY_RESULT_BACKEND"}, 503
+        if not inference_job_exists(inference_uuid):
+            return {"message": "Inference not found"}, 404
+        return Response(
+            stream_with_context(
+                inference_progress_events(
+                    inference_uuid, app_constants.PROGRESS_POLL_INTERVAL
+                )
+            ),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+
+@ns.route("/profile")
+class InferenceProfile(Resource):
+    @ns.expect(profile_parser)
+    @ns.response(200, "cProfile stats of a profiled inference job")
+    def get(self):
+        """Download the cProfile stats of an inference job posted with profile"""
+        inference_uuid = request.args.get("uuid")
+        profile_path = get_profile_path(inference_uuid)
+        if not profile_path:
+            return {"message": "No profile for this inference"}, 404
+
+        if profile_path.startswith("s3://"):
+            bucket_name, profile_key = profile_path[len("s3://") :].split("/", 1)
+            body, _, _, _ = get_s3_file(bucket_name, profile_key)
+            if not body:
+                return {"message": "Profile not found"}, 404
+            data = body.read()
+        elif os.path.exists(profile_path):
+            with open(profile_path, "rb") as f:
+                data = f.read()
+        else:
+            return {"message": "Profile not found"}, 404
+
+        return Response(
+            data,
+            mimetype="application/octet-stream",
+            headers={
+                "Content-Disposition": f"attachment; filename={inference_uuid}.prof"
+            },
+        )
+
+
+@ns.route("/search")
+class InferenceSearch(Resource):
+    @ns.expect(search_parser)
+    @ns.response(200, "Success")
+    def get(self):
+        """Find the completed inferences and frames that contain a plate number"""
+        plate_number = (request.args.get("plate") or "").strip()
+        if not plate_number:
+            return {"message": "A plate number is required"}, 400
+        limit = request.args.get("limit", 100, type=int)
+        if not 0 < limit <= MAX_PAGE_SIZE:
+            return {"message": f"limit must be between 1 and {MAX_PAGE_SIZE}"}, 400
+        max_distance = request.args.get("max_distance", 1, type=int)
+        if not 0 <= max_distance <= app_constants.PLATE_INDEX_MAX_DISTANCE:
+            return {
+                "message": f"max_distance must be between 0 and {app_constants.PLATE_INDEX_MAX_DISTANCE}"
+            }, 400
+        resp = search_plate(
+            plate_number,
+            limit,
+            fuzzy=is_true(request.args.get("fuzzy")),
+            max_distance=max_distance,
+        )
+        return {
+            "message": "Plate search completed successfully",
+            "plate": plate_number,
+            "candidates": resp["candidates"],
+            "inference_results": resp["inference_results"],
+        }, 200
+
+
+upload_sessions = UploadSessionStore(app_constants.VIDEO_DOWNLOAD_TEMP_DIR)
+
+
+@ns.route("/uploads")
+class InferenceUploads(Resource):
+    @ns.expect(upload_session_parser)
+    @ns.response(200, "Success", upload_session_model)
+    def post(self):
+        """Create a resumable upload session for a large inference video"""
+        output_mode = request.args.get("output_mode", OutputModes.VIDEO)
+        if output_mode not in OutputModes.ALL:
+            return {"message": f"Invalid output_mode: {output_mode}"}, 400
+        session = upload_sessions.create(
+            total_size=request.args.get("total_size", type=int),
+            options={
+                "output_mode": output_mode,
+                "profile": is_true(request.args.get("profile")),
+            },
+        )
+        return {"message": "Upload session created", "body": session}, 200
+
+
+@ns.route("/uploads/<string:upload_id>")
+class InferenceUpload(Resource):
+    @ns.response(200, "Success", upload_session_model)
+    def get(self, upload_id):
+        """Get the offset to resume an upload from"""
+        try:
+            session = upload_sessions.status(upload_id)
+        except UploadSessionError as e:
+            return {"message": str(e)}, e.status_code
+        return {"message": "Upload session retrieved", "body": session}, 200
+
+    @ns.expect(upload_chunk_parser)
+    @ns.response(200, "Success", upload_session_model)
+    @ns.response(409, "The offset is not the number of bytes received so far")
+    @ns.response(413, "The chunk goes past the declared total_size")
+    def put(self, upload_id):
+        """Write the raw request body as the chunk at the given offset"""
+        offset = request.args.get("offset", type=int)
+        if offset is None or offset < 0:
+            return {"message": "A non-negative offset is required"}, 400
+        try:
+            new_offset = upload_sessions.write_chunk(
+                upload_id,
+                offset,
+                request.stream,
+                request.headers.get("X-Chunk-SHA256"),
+            )
+        except UploadSessionError as e:
+            return {
+                "message": str(e),
+                "offset": getattr(e, "offset", None),
+            }, e.status_code
+        UPLOAD_BYTES.labels(endpoint="uploads").inc(new_offset - offset)
+        return {
+            "message": "Chunk received",
+            "body": {"upload_id": upload_id, "offset": new_offset},
+        }, 200
+
+
+@ns.route("/uploads/<string:upload_id>/complete")
+class InferenceUploadComplete(Resource):
+    @ns.expect(force_parser)
+    @ns.response(200, "Success", inference_model)
+    def post(self, upload_id):
+        """Finalize the upload and post the inference job"""
+        try:
+            session = upload_sessions.finalize(upload_id)
+        except UploadSessionError as e:
+            return {"message": str(e)}, e.status_code
+        resp = start_inference_by_model_uuid(
+            upload_id,
+            session["options"],
+            video_sha256=hash_file(
+                f"{app_constants.VIDEO_DOWNLOAD_TEMP_DIR}/{upload_id}.mp4"
+            ),
+            force=is_true(request.args.get("force")),
+        )
+        return {"message": "Inference job posted successfully", "body": resp}, 200
@@ -1,18 +1,61 @@
-from app.jobs.inference_worker import start_inference
+from app.jobs.inference_worker import start_inference, worker, PROGRESS
 from app.models.models import InferenceModel
 from app.models.models import JobsModel
+from app.models.models import DetectionModel
+from app.constants import AppConstants as app_constants
+from app.core.fingerprint import model_version, settings_fingerprint
+from app.core.plate_index import FuzzyPlateIndex
+from app.core.inference_results import filter_detections
 from celery import states
+import base64
+import binascii
 import json
+import os
+import time
 from datetime import datetime
 
+PROGRESS_KEEPALIVE_SECONDS = 15
 
-def start_inference_by_model_uuid(temp_uuid):
-    result = start_inference.apply_async(args=[temp_uuid])
+
+plate_index = FuzzyPlateIndex(
+    DetectionModel.get_plates_after,
+    max_distance=app_constants.PLATE_INDEX_MAX_DISTANCE,
+    rebuild_interval=app_constants.PLATE_INDEX_REBUILD_SECONDS,
+)
+
+
+def start_inference_by_model_uuid(
+    temp_uuid, options=None, video_sha256=None, force=False
+):
+    options = dict(options or {})
+    # a profile is only useful if the video is actually processed again
+    force = force or bool(options.get("profile"))
+    if video_sha256:
+        options["video_sha256"] = video_sha256
+        options["model_version"] = model_version()
+        # only options that change the output, the profile flag does not
+        options["inference_settings"] = settings_fingerprint(
+            {"output_mode": options.get("output_mode")}
+        )
+        if not force:
+            duplicate = InferenceModel.get_completed_duplicate(
+                video_sha256, options["model_version"], options["inference_settings"]
+            )
+            if duplicate is not None:
+                # same video, model and settings: reuse the finished result
+                os.remove(f"{app_constants.VIDEO_DOWNLOAD_TEMP_DIR}/{temp_uuid}.mp4")
+                return {
+                    "uuid": duplicate.inference_uuid,
+                    "duplicate_of": duplicate.inference_uuid,
+                }
+
+    result = start_inference.apply_async(args=[temp_uuid, options])
     resp = {"uuid": result.task_id}
     return resp
 
 
-def get_inference_by_uuid(uuid):
+def get_inference_by_uuid(uuid, detection_filters=None):
+    """Job status and result; detection_filters are passed to filter_detections"""
     inference_job = JobsModel.get_record_by_uuid(uuid)
     job_status = inference_job.job_status
     inference_output = None
@@ -20,12 +63,73 @@ def get_inference_by_uuid(uuid):
         inference = InferenceModel.get_record_by_uuid(inference_job.reference_uuid)
         inference_output = inference.inference_output
 
+    inference_result = json.loads(inference_output) if inference_output else None
+    if inference_result and detection_filters:
+        inference_result["plate_numbers_with_info"] = filter_detections(
+            inference_result.get("plate_numbers_with_info", []), **detection_filters
+        )
+
     return {
         "status": job_status,
-        "inference_result": json.loads(inference_output) if inference_output else None,
+        "inference_result": inference_result,
     }
 
 
+def has_result_backend():
+    return bool(worker.conf.result_backend)
+
+
+def inference_job_exists(uuid):
+    """Whether the result backend or the jobs table knows the job; the backend
+    reports PENDING for unknown and expired uuids alike"""
+    if worker.backend.get_task_meta(uuid).get("status") != states.PENDING:
+        return True
+    return JobsModel.get_record_by_uuid(uuid) is not None
+
+
+def inference_progress_events(uuid, poll_interval):
+    """Server-Sent Events with the state of the task, read from the result
+    backend instead of the database, until the task is done"""
+    last_event = None
+    last_sent_at = time.monotonic()
+    checked_jobs = False
+    while True:
+        meta = worker.backend.get_task_meta(uuid)
+        status = meta.get("status")
+        if status == states.PENDING and not checked_jobs:
+            # an expired result, or a duplicate_of uuid that never had a task,
+            # stays PENDING forever; the jobs table has its final status
+            checked_jobs = True
+            job = JobsModel.get_record_by_uuid(uuid)
+            if job is None:
+                event = {"uuid": uuid, "status": None, "error": "Inference not found"}
+                yield f"event: progress\ndata: {json.dumps(event)}\n\n"
+                return
+            if job.job_status in states.READY_STATES:
+                event = {"uuid": uuid, "status": job.job_status}
+                yield f"event: progress\ndata: {json.dumps(event)}\n\n"
+                return
+        event = {"uuid": uuid, "status": status}
+        if status == PROGRESS and isinstance(meta.get("result"), dict):
+            event.update(meta["result"])
+        elif status == states.FAILURE:
+            event["error"] = str(meta.get("result"))
+
+        now = time.monotonic()
+        if event != last_event:
+            yield f"event: progress\ndata: {json.dumps(event)}\n\n"
+            last_event = event
+            last_sent_at = now
+        elif now - last_sent_at > PROGRESS_KEEPALIVE_SECONDS:
+            # comment line, keeps proxies from closing an idle stream
+            yield ": keep-alive\n\n"
+            last_sent_at = now
+
+        if status in states.READY_STATES:
+            return
+        time.sleep(poll_interval)
+
+
 def get_latest_inference_job():
     record = InferenceModel.get_latest_completed_record()
     if record is None:
@@ -37,10 +141,23 @@ def get_latest_inference_job():
     }
 
 
-def get_all_inference_job():
-    records = InferenceModel.get_all_inference_job()
-    if records is None:
-        return None
+def get_all_inference_job(
+    limit, cursor=None, inference_status=None, start_datetime=None, end_datetime=None
+):
+    records = InferenceModel.get_inference_page(
+        limit + 1,
+        after=decode_cursor(cursor) if cursor else None,
+        inference_status=inference_status,
+        start_datetime=start_datetime,
+        end_datetime=end_datetime,
+    )
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        next_cursor = encode_cursor(
+            records[-1].inference_datetime, records[-1].inference_uuid
+        )
+
     l = list()
     for record in records:
         l.append(
@@ -52,7 +169,55 @@ def get_all_inference_job():
                 ),
             }
         )
-    return l
+    return {"inference_results": l, "next_cursor": next_cursor}
+
+
+def encode_cursor(inference_datetime, inference_uuid):
+    raw = f"{inference_datetime.isoformat()}|{inference_uuid}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Raises ValueError for a cursor that was not produced by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        inference_datetime, inference_uuid = raw.split("|", 1)
+        return datetime.fromisoformat(inference_datetime), inference_uuid
+    except (UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def search_plate(plate_number, limit, fuzzy=False, max_distance=1):
+    """Inferences and frames in which plate_number, or with fuzzy a plate within
+    max_distance edits of it after folding confusable characters, was detected"""
+    if fuzzy:
+        # pick up the plates stored by jobs finished since the last search
+        plate_index.refresh()
+        candidates = plate_index.search(plate_number, max_distance)
+    else:
+        candidates = [{"plate_number": plate_number, "distance": 0}]
+
+    inferences = {}
+    plate_numbers = [candidate["plate_number"] for candidate in candidates]
+    detections = (
+        DetectionModel.search_by_plates(plate_numbers, limit) if plate_numbers else []
+    )
+    for detection in detections:
+        inferences.setdefault(detection.inference_uuid, []).append(
+            detection.to_dict()
+        )
+    return {
+        "candidates": candidates,
+        "inference_results": [
+            {"inference_uuid": inference_uuid, "detections": detections}
+            for inference_uuid, detections in inferences.items()
+        ],
+    }
+
+
+def get_profile_path(inference_uuid):
+    record = InferenceModel.get_record_by_uuid(inference_uuid)
+    return record.profile_path if record is not None else None
 
 
 def delete_inference(inference_uuid):
@@ -1,6 +1,9 @@
-from flask import request, make_response
+from flask import request, Response, stream_with_context
 from flask_restx import Namespace, Resource, fields
-from app.core.s3_utils import get_s3_file
+from werkzeug.http import unquote_etag
+from app.constants import AppConstants as app_constants
+from app.core.range_cache import RangeCache
+from app.core.s3_utils import get_s3_file, head_s3_file
 import os
 
 ns = Namespace("video", description="video operations")
@@ -8,6 +11,42 @@ ns = Namespace("video", description="video operations")
 get_parser = ns.parser()
 get_parser.add_argument("uuid", type=str, required=True, help="The inference UUID")
 
+range_cache = (
+    RangeCache(
+        app_constants.VIDEO_CACHE_DIR,
+        app_constants.VIDEO_CACHE_MAX_BYTES,
+        app_constants.VIDEO_CACHE_MAX_ENTRY_BYTES,
+    )
+    if app_constants.VIDEO_CACHE_MAX_BYTES > 0
+    else None
+)
+
+STREAM_CHUNK_SIZE = 256 * 1024
+
+
+def stream_s3_body(body, cache_writer=None):
+    """Yield the S3 body in chunks, copying them into the range cache when given"""
+    completed = False
+    try:
+        for chunk in body.iter_chunks(chunk_size=STREAM_CHUNK_SIZE):
+            if cache_writer is not None:
+                cache_writer.write(chunk)
+            yield chunk
+        completed = True
+    finally:
+        body.close()
+        if cache_writer is not None:
+            if completed:
+                cache_writer.commit()
+            else:
+                cache_writer.discard()
+
+
+def stream_file(path):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b""):
+            yield chunk
+
 
 @ns.route("/preprocessed")
 class PreprocessedVideo(Resource):
@@ -18,23 +57,53 @@ class PreprocessedVideo(Resource):
         range_header = request.headers.get("Range", None)
         bucket_name = os.getenv("BUCKET_NAME")
         file_key = f"mesos/{inference_uuid}.mp4"
-        file_content, content_type, content_range, content_length = get_s3_file(
-            bucket_name, file_key, range_header
-        )
 
-        if file_content:
-            response = make_response(file_content.read())
-            response.headers.set("Content-Type", content_type)
-            response.headers.set(
-                "Content-Disposition", "inline; filename=input_video.mp4"
-            )
-            response.headers.set("Accept-Ranges", "bytes")
-            if content_range:
-                response.headers.set("Content-Range", content_range)
-                response.headers.set("Content-Length", str(content_length))
-                response.status_code = 206  # Partial Content
-            else:
-                response.headers.set("Content-Length", str(content_length))
+        metadata = head_s3_file(bucket_name, file_key)
+        if metadata is None:
+            return {"message": "File not found"}, 404
+        etag, _ = unquote_etag(metadata["etag"])
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
             return response
+
+        cached = (
+            range_cache.get(file_key, etag, range_header)
+            if range_cache is not None
+            else None
+        )
+        if cached is not None:
+            headers, data_path = cached
+            body = stream_file(data_path)
         else:
-            return {"message": "File not found"}, 404
+            file_content, content_type, content_range, content_length = get_s3_file(
+                bucket_name, file_key, range_header
+            )
+            if not file_content:
+                return {"message": "File not found"}, 404
+            headers = {
+                "content_type": content_type,
+                "content_range": content_range,
+                "content_length": content_length,
+            }
+            cache_writer = (
+                range_cache.writer(file_key, etag, range_header, headers)
+                if range_cache is not None and range_cache.accepts(content_length)
+                else None
+            )
+            body = stream_s3_body(file_content, cache_writer)
+
+        response = Response(stream_with_context(body), direct_passthrough=True)
+        response.headers.set("Content-Type", headers["content_type"])
+        response.headers.set("Content-Disposition", "inline; filename=input_video.mp4")
+        response.headers.set("Accept-Ranges", "bytes")
+        response.headers.set("Content-Length", str(headers["content_length"]))
+        response.headers.set(
+            "Cache-Control", f"public, max-age={app_constants.VIDEO_CACHE_MAX_AGE}"
+        )
+        response.set_etag(etag)
+        if headers["content_range"]:
+            response.headers.set("Content-Range", headers["content_range"])
+            response.status_code = 206  # Partial Content
+        return response
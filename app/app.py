@@ -37,6 +37,16 @@ def init_app():
     register_namespaces(api)
     app.register_blueprint(blueprint)
 
+    # Give every request thread its own DB session and return it to the pool afterwards
+    from app.models.models import remove_session
+
+    app.teardown_appcontext(remove_session)
+
+    # Request latency per namespace, served with the other metrics on /metrics
+    from app.core.metrics import init_app_metrics
+
+    init_app_metrics(app)
+
     # Register error handlers
     @app.errorhandler(HTTPException)
     def app_error_handler(err):
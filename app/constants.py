@@ -1,3 +1,4 @@
+import os
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,9 +11,42 @@ class AppConstants:
     MODEL_UPLOAD_TEMP_DIR = "temp/models/upload/lpd.pt"
     MODEL_DOWNLOAD_TEMP_DIR = "temp/models/download/lpd.pt"
     VIDEO_UPLOAD_TEMP_DIR = "temp/videos/upload"
+    PROFILE_DIR = "temp/profiles"
     VIDEO_DOWNLOAD_TEMP_DIR = "temp/videos/download"
     DATA_UPLOAD_TEMP_DIR = "temp/data/upload/plate_numbers_with_info.json"
     DATA_DOWNLOAD_TEMP_DIR = "temp/data/download/"
+    WARMUP_FRAME_SIZE = 640
+    DETECTION_BATCH_SIZE = int(os.getenv("DETECTION_BATCH_SIZE", "1"))
+    OCR_MODE = os.getenv("OCR_MODE", "full")
+    OCR_USE_ANGLE_CLS = os.getenv("OCR_USE_ANGLE_CLS", "true").lower() == "true"
+    PIPELINE_ENABLED = os.getenv("PIPELINE_ENABLED", "false").lower() == "true"
+    PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+    DETECTION_STRIDE = int(os.getenv("DETECTION_STRIDE", "1"))
+    MOTION_THRESHOLD = float(os.getenv("MOTION_THRESHOLD", "0"))
+    MOTION_MAX_SKIPPED = int(os.getenv("MOTION_MAX_SKIPPED", "30"))
+    TRACKING_ENABLED = os.getenv("TRACKING_ENABLED", "false").lower() == "true"
+    TRACK_MAX_AGE = int(os.getenv("TRACK_MAX_AGE", "15"))
+    TRACK_MAX_OCR = int(os.getenv("TRACK_MAX_OCR", "3"))
+    OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "0"))
+    OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR")
+    PLATE_INDEX_MAX_DISTANCE = int(os.getenv("PLATE_INDEX_MAX_DISTANCE", "2"))
+    PLATE_INDEX_REBUILD_SECONDS = int(os.getenv("PLATE_INDEX_REBUILD_SECONDS", "300"))
+    VIDEO_ENCODER = os.getenv("VIDEO_ENCODER", "opencv")
+    SEGMENT_SECONDS = int(os.getenv("SEGMENT_SECONDS", "0"))
+    PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", "1.0"))
+    PROGRESS_POLL_INTERVAL = float(os.getenv("PROGRESS_POLL_INTERVAL", "0.5"))
+    WORKER_PROC_ALIVE_TIMEOUT = float(os.getenv("WORKER_PROC_ALIVE_TIMEOUT", "300"))
+    WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
+    STREAM_IDLE_TIMEOUT = float(os.getenv("STREAM_IDLE_TIMEOUT", "5.0"))
+    STREAM_RECENT_DETECTIONS = int(os.getenv("STREAM_RECENT_DETECTIONS", "50"))
+    S3_PART_SIZE = int(os.getenv("S3_PART_SIZE", str(8 * 1024 * 1024)))
+    S3_MAX_PENDING_PARTS = int(os.getenv("S3_MAX_PENDING_PARTS", "4"))
+    VIDEO_CACHE_DIR = "temp/videos/cache"
+    VIDEO_CACHE_MAX_BYTES = int(os.getenv("VIDEO_CACHE_MAX_BYTES", str(1024**3)))
+    VIDEO_CACHE_MAX_ENTRY_BYTES = int(
+        os.getenv("VIDEO_CACHE_MAX_ENTRY_BYTES", str(16 * 1024**2))
+    )
+    VIDEO_CACHE_MAX_AGE = int(os.getenv("VIDEO_CACHE_MAX_AGE", "3600"))
 
 
 class JobConstants:
@@ -22,3 +56,10 @@ class JobConstants:
     DEPLOY_MODEL = "deploy_model"
     DELETE_MODEL = "delete_model"
     START_INFERENCE = "start_inference"
+
+
+class OutputModes:
+    VIDEO = "video"  # annotated video uploaded to S3
+    DETECTIONS = "detections"  # plate readings only, no video output
+    OVERLAY = "overlay"  # original video plus a per-frame overlay sidecar in S3
+    ALL = [VIDEO, DETECTIONS, OVERLAY]
@@ -1,11 +1,29 @@
 import cv2
+import json
+import numpy as np
 import os
 from ultralytics import YOLO
 from paddleocr import PaddleOCR
-import boto3
 from app.constants import AppConstants as app_constants
+from app.constants import OutputModes
+from app.core.frame_selector import FrameSelector
+from app.core.metrics import FFMPEG_SECONDS, FRAMES, OCR_CROPS
+from app.core.metrics import record_s3_transfer, timed
+from app.core.ocr_cache import OCRCache, perceptual_hash
+from app.core.pipeline import Pipeline, StopPipeline, run_sequential
+from app.core.plate_tracker import PlateTracker, plate_sharpness
+from app.core.progress import ProgressReporter
+from app.core.s3_multipart import MultipartUploadSink
+from app.core.s3_utils import create_s3_client
+from app.core.stream_source import LatencyStats, LatestFrameReader
+from app.core.video_encoder import (
+    FFmpegPipeEncoder,
+    FFmpegStreamingEncoder,
+    OpenCVVideoEncoder,
+)
 import logging
 import subprocess
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -18,10 +36,43 @@ class InferenceManager:
         self.disk_upload_path = app_constants.VIDEO_UPLOAD_TEMP_DIR
         self.model_path = app_constants.MODEL_UPLOAD_TEMP_DIR
         self.display_real_time = False  # Set to True to enable real-time display
-        self.confidence_threshold = (
+        self.confidence_threshold = float(
             os.environ.get("MODEL_CONF") or 0.5
         )  # Confidence threshold for detections
         self.upload_to_s3 = True  # Set to True to upload video to S3
+        self.detection_batch_size = max(
+            1, app_constants.DETECTION_BATCH_SIZE
+        )  # Number of frames sent to YOLO per call, 1 keeps the per-frame path
+        self.ocr_mode = (
+            app_constants.OCR_MODE
+        )  # "full" runs detection + recognition per crop, "rec" batches recognition only
+        self.ocr_use_angle_cls = app_constants.OCR_USE_ANGLE_CLS
+        self.pipeline_enabled = (
+            app_constants.PIPELINE_ENABLED
+        )  # Run decode, detection + OCR and annotation + encode in parallel threads
+        self.pipeline_queue_size = app_constants.PIPELINE_QUEUE_SIZE
+        self.detection_stride = (
+            app_constants.DETECTION_STRIDE
+        )  # Run detection on every n-th frame only
+        self.motion_threshold = (
+            app_constants.MOTION_THRESHOLD
+        )  # Skip frames that changed less than this since the last detection, 0 disables
+        self.motion_max_skipped = app_constants.MOTION_MAX_SKIPPED
+        self.tracking_enabled = (
+            app_constants.TRACKING_ENABLED
+        )  # Track plates across frames and OCR each track only a few times
+        self.video_encoder = (
+            app_constants.VIDEO_ENCODER
+        )  # "opencv" writes mp4v then re-encodes, "ffmpeg" pipes frames to libx264 in one pass,
+        # "ffmpeg-stream" also uploads fragmented MP4 to S3 while encoding
+        self.ocr_cache = (
+            OCRCache(
+                max_entries=app_constants.OCR_CACHE_SIZE,
+                disk_dir=app_constants.OCR_CACHE_DIR,
+            )
+            if app_constants.OCR_CACHE_SIZE > 0
+            else None
+        )  # Reuse readings of near-identical plate crops across frames and jobs
         self.model = YOLO(self.model_path)
         self.ocr = PaddleOCR(
             use_angle_cls=True,
@@ -29,6 +80,15 @@ class InferenceManager:
             show_log=False,
         )
 
+    def warmup(self):
+        """Run a dummy frame through YOLO and OCR so the first job is not slow"""
+        dummy_frame = np.zeros(
+            (app_constants.WARMUP_FRAME_SIZE, app_constants.WARMUP_FRAME_SIZE, 3),
+            dtype=np.uint8,
+        )
+        self.model(dummy_frame, verbose=False)
+        self._run_ocr([dummy_frame[:48, :160]])
+
     def reencode_video_ffmpeg(self, input_path, output_path):
         command = [
             "ffmpeg",
@@ -56,7 +116,10 @@ class InferenceManager:
             )
 
         try:
-            result = subprocess.run(command, check=True, capture_output=True, text=True)
+            with timed(FFMPEG_SECONDS, operation="reencode"):
+                result = subprocess.run(
+                    command, check=True, capture_output=True, text=True
+                )
             logger.info(f"FFmpeg output: {result.stdout}")
 
         except subprocess.CalledProcessError as e:
@@ -86,11 +149,227 @@ class InferenceManager:
         result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         return bool(result.stdout)
 
-    def detect_car_plates_yolov8(self, inference_uuid):
+    def _read_frames(self, cap, count):
+        """Read up to count frames, fewer only at the end of the video"""
+        frames = []
+        while len(frames) < count:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        return frames
+
+    def _detect_plate_boxes(self, frames, detection_area):
+        """Run YOLO on a batch of frames and return the plate boxes of each frame"""
+        if len(frames) == 1:
+            results = self.model(frames[0])
+        else:
+            results = self.model(frames)
+
+        plate_boxes = []
+        for result in results:
+            frame_boxes = []
+            for detection in result.boxes:
+                x1, y1, x2, y2 = detection.xyxy[0]
+                x, y, w, h = int(x1), int(y1), int(x2 - x1), int(y2 - y1)
+                if (
+                    x > detection_area["x"]
+                    and y > detection_area["y"]
+                    and x + w < detection_area["x"] + detection_area["width"]
+                    and y + h < detection_area["y"] + detection_area["height"]
+                ):
+                    frame_boxes.append((x, y, w, h))
+            plate_boxes.append(frame_boxes)
+        return plate_boxes
+
+    def _crop_plate(self, frame, box):
+        x, y, w, h = box
+        plate_frame = frame[y : y + h, x : x + w]
+        return cv2.resize(plate_frame, (0, 0), fx=0.5, fy=0.5)
+
+    def recognize_plates(self, plate_crops):
+        """Read each plate crop and return a (plate_number, confidence) per crop"""
+        if not plate_crops:
+            return []
+        if self.ocr_cache is None:
+            OCR_CROPS.labels(source="ocr").inc(len(plate_crops))
+            return self._run_ocr(plate_crops)
+
+        cache_keys = [perceptual_hash(plate_crop) for plate_crop in plate_crops]
+        readings = [self.ocr_cache.get(cache_key) for cache_key in cache_keys]
+        misses = [index for index, reading in enumerate(readings) if reading is None]
+        OCR_CROPS.labels(source="cache").inc(len(plate_crops) - len(misses))
+        OCR_CROPS.labels(source="ocr").inc(len(misses))
+        for index, reading in zip(
+            misses, self._run_ocr([plate_crops[index] for index in misses])
+        ):
+            self.ocr_cache.put(cache_keys[index], reading)
+            readings[index] = reading
+        return readings
+
+    def _run_ocr(self, plate_crops):
+        if not plate_crops:
+            return []
+
+        if self.ocr_mode == "rec":
+            # YOLO already located the plate, so skip text detection and
+            # recognize every crop in one batched call; ocr(det=False) only
+            # batches a list of crops on PaddleOCR 2.7, the classifier and the
+            # recognizer take one on every 2.x release
+            if self.ocr_use_angle_cls:
+                plate_crops, _, _ = self.ocr.text_classifier(plate_crops)
+            rec_result, _ = self.ocr.text_recognizer(plate_crops)
+            return [
+                (plate_number, conf) if plate_number else ("", 0)
+                for plate_number, conf in rec_result
+            ]
+
+        readings = []
+        for plate_crop in plate_crops:
+            ocr_result = self.ocr.ocr(plate_crop, cls=True)
+            readings.append(
+                ocr_result[0][0][1]
+                if ocr_result and ocr_result[0] and len(ocr_result[0]) > 0
+                else ("", 0)
+            )
+        return readings
+
+    def _detect_and_read_plates(
+        self, frames, frame_numbers, detection_area, tracker=None
+    ):
+        """Detect and read the plates of a frame batch.
+
+        Returns a (detections, readings) pair per frame: the detections to draw
+        and the OCR readings to store. Without a tracker both are the same.
+        """
+        if not frames:
+            return []
+
+        frame_boxes = self._detect_plate_boxes(frames, detection_area)
+        if tracker is not None:
+            return self._read_tracked_plates(
+                frames, frame_numbers, frame_boxes, tracker
+            )
+
+        # crop every plate of the batch before drawing so OCR sees clean frames
+        plate_readings = iter(
+            self.recognize_plates(
+                [
+                    self._crop_plate(frame, box)
+                    for frame, plate_boxes in zip(frames, frame_boxes)
+                    for box in plate_boxes
+                ]
+            )
+        )
+
+        frame_detections = []
+        for frame_number, plate_boxes in zip(frame_numbers, frame_boxes):
+            detections = []
+            for box in plate_boxes:
+                plate_number, conf = next(plate_readings)
+                if conf < self.confidence_threshold:
+                    continue
+                detections.append(
+                    {
+                        "frame_number": frame_number,
+                        "bounding_box": box,
+                        "plate_number": plate_number,
+                        "confidence": conf,
+                    }
+                )
+            frame_detections.append((detections, detections))
+        return frame_detections
+
+    def _read_tracked_plates(self, frames, frame_numbers, frame_boxes, tracker):
+        """OCR only the crops the tracker asks for and label every box with its track's vote"""
+        frame_tracks = []
+        ocr_requests = []  # (frame index, box, track, crop)
+        for frame_index, (frame, frame_number, plate_boxes) in enumerate(
+            zip(frames, frame_numbers, frame_boxes)
+        ):
+            tracks = tracker.update(frame_number, plate_boxes)
+            frame_tracks.append(tracks)
+            for box, track in zip(plate_boxes, tracks):
+                plate_crop = self._crop_plate(frame, box)
+                if tracker.claim_ocr(track, plate_sharpness(plate_crop)):
+                    ocr_requests.append((frame_index, box, track, plate_crop))
+
+        frame_readings = [[] for _ in frames]
+        plate_readings = self.recognize_plates(
+            [plate_crop for _, _, _, plate_crop in ocr_requests]
+        )
+        for (frame_index, box, track, _), (plate_number, conf) in zip(
+            ocr_requests, plate_readings
+        ):
+            if conf < self.confidence_threshold:
+                continue
+            track.add_reading(plate_number, conf)
+            frame_readings[frame_index].append(
+                {
+                    "frame_number": frame_numbers[frame_index],
+                    "bounding_box": box,
+                    "plate_number": plate_number,
+                    "confidence": conf,
+                    "track_id": track.track_id,
+                }
+            )
+
+        frame_detections = []
+        for frame_number, plate_boxes, tracks, readings in zip(
+            frame_numbers, frame_boxes, frame_tracks, frame_readings
+        ):
+            detections = []
+            for box, track in zip(plate_boxes, tracks):
+                if track.reading is None:
+                    continue
+                plate_number, conf = track.reading
+                detections.append(
+                    {
+                        "frame_number": frame_number,
+                        "bounding_box": box,
+                        "plate_number": plate_number,
+                        "confidence": conf,
+                        "track_id": track.track_id,
+                    }
+                )
+            frame_detections.append((detections, readings))
+        return frame_detections
+
+    def _annotate_frame(self, frame, detections):
+        for detection in detections:
+            x, y, w, h = detection["bounding_box"]
+            plate_number = detection["plate_number"]
+            cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
+            cv2.putText(
+                frame,
+                plate_number,
+                (x, y - 10),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.9,
+                (255, 0, 0),
+                2,
+            )
+            logger.debug(
+                f"Bounding box drawn: ({x}, {y}), ({x + w}, {y + h}), Text: {plate_number}"
+            )
+
+    def detect_car_plates_yolov8(
+        self,
+        inference_uuid,
+        output_mode=OutputModes.VIDEO,
+        upload_output=True,
+        progress_callback=None,
+        pipeline_enabled=None,
+    ):
+        """progress_callback is called with throttled ProgressReporter snapshots,
+        pipeline_enabled overrides the PIPELINE_ENABLED setting for this video"""
+        if pipeline_enabled is None:
+            pipeline_enabled = self.pipeline_enabled
         logger.info(f"Processing video {inference_uuid}.mp4")
         input_video_path = f"{self.disk_download_path}/{inference_uuid}.mp4"
         output_video_temp_path = f"{self.disk_upload_path}/{inference_uuid}_temp.mp4"
         output_video_path = f"{self.disk_upload_path}/{inference_uuid}.mp4"
+        output_video_key = f"{self.s3_upload_path}/{inference_uuid}.mp4"
 
         os.makedirs(os.path.dirname(input_video_path), exist_ok=True)
         os.makedirs(os.path.dirname(output_video_temp_path), exist_ok=True)
@@ -102,26 +381,60 @@ class InferenceManager:
 
         frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        source_fps = int(cap.get(cv2.CAP_PROP_FPS))
-        fourcc = cv2.VideoWriter_fourcc(
-            *"mp4v"
-        )  # Try "mp4v", "XVID", "avc1", or "H264"
-
-        out = cv2.VideoWriter(
-            output_video_temp_path,
-            fourcc,
-            source_fps,
-            (frame_width, frame_height),
+        source_fps = cap.get(cv2.CAP_PROP_FPS)  # exact, e.g. 29.97 for NTSC sources
+        progress = (
+            ProgressReporter(
+                progress_callback,
+                total_frames=int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+                interval=app_constants.PROGRESS_INTERVAL,
+            )
+            if progress_callback is not None
+            else None
         )
-
-        if not out.isOpened():
-            logger.error(
-                f"Error: Could not open output video file {output_video_temp_path}"
+        out = None
+        streams_to_s3 = (
+            self.video_encoder == "ffmpeg-stream"
+            and upload_output
+            and self.upload_to_s3
+        )
+        if output_mode != OutputModes.VIDEO:
+            pass  # detections only, the source video is never re-encoded
+        elif streams_to_s3:
+            out = FFmpegStreamingEncoder(
+                input_video_path,
+                MultipartUploadSink(
+                    self.bucket_name,
+                    output_video_key,
+                    part_size=app_constants.S3_PART_SIZE,
+                    max_pending=app_constants.S3_MAX_PENDING_PARTS,
+                ),
+                source_fps,
+                (frame_width, frame_height),
             )
+        elif self.video_encoder in ("ffmpeg", "ffmpeg-stream"):
+            out = FFmpegPipeEncoder(
+                input_video_path,
+                output_video_path,
+                source_fps,
+                (frame_width, frame_height),
+            )
+        else:
+            out = OpenCVVideoEncoder(
+                output_video_temp_path,
+                output_video_path,
+                source_fps,
+                (frame_width, frame_height),
+                self.reencode_video_ffmpeg,
+            )
+
+        if out is not None and not out.is_opened():
+            logger.error(f"Error: Could not open output video for {inference_uuid}")
+            out.abort()
+            cap.release()
             return
 
         plate_numbers_with_info = []
-        frame_count = 0
+        overlay_frames = {} if output_mode == OutputModes.OVERLAY else None
 
         detection_area = {
             "x": 0,
@@ -130,93 +443,262 @@ class InferenceManager:
             "height": frame_height,
         }
 
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
+        frame_selector = FrameSelector(
+            stride=self.detection_stride,
+            motion_threshold=self.motion_threshold,
+            max_skipped=self.motion_max_skipped,
+        )
+
+        def decode_frames():
+            frame_number = 0
+            while cap.isOpened():
+                frames = self._read_frames(cap, self.detection_batch_size)
+                if not frames:
+                    return
+                FRAMES.inc(len(frames))
+                frame_numbers = list(range(frame_number, frame_number + len(frames)))
+                selected = [
+                    frame_selector.select(number, frame)
+                    for number, frame in zip(frame_numbers, frames)
+                ]
+                yield frame_numbers, frames, selected
+                frame_number += len(frames)
+
+        tracker = (
+            PlateTracker(
+                max_age=app_constants.TRACK_MAX_AGE,
+                max_ocr_per_track=app_constants.TRACK_MAX_OCR,
+            )
+            if self.tracking_enabled
+            else None
+        )
+        last_detections = []
+
+        def detect_and_read(batch):
+            nonlocal last_detections
+            frame_numbers, frames, selected = batch
+            detected = iter(
+                self._detect_and_read_plates(
+                    [frame for frame, keep in zip(frames, selected) if keep],
+                    [number for number, keep in zip(frame_numbers, selected) if keep],
+                    detection_area,
+                    tracker,
+                )
+            )
+
+            # skipped frames reuse the last detections so the boxes don't flicker
+            frame_detections = []
+            for keep in selected:
+                if keep:
+                    last_detections, readings = next(detected)
+                else:
+                    readings = []
+                frame_detections.append((last_detections, readings))
+            return frame_numbers, frames, frame_detections
 
-            results = self.model(frame)
-            current_frame_plates = []
-            for result in results:
-                for detection in result.boxes:
-                    x1, y1, x2, y2 = detection.xyxy[0]
-                    x, y, w, h = int(x1), int(y1), int(x2 - x1), int(y2 - y1)
-                    if (
-                        x > detection_area["x"]
-                        and y > detection_area["y"]
-                        and x + w < detection_area["x"] + detection_area["width"]
-                        and y + h < detection_area["y"] + detection_area["height"]
-                    ):
-                        current_frame_plates.append((x, y, w, h))
-                        plate_frame = frame[y : y + h, x : x + w]
-
-                        plate_frame_resized = cv2.resize(
-                            plate_frame, (0, 0), fx=0.5, fy=0.5
-                        )
-                        ocr_result = self.ocr.ocr(plate_frame_resized, cls=True)
-                        plate_number, conf = (
-                            ocr_result[0][0][1]
-                            if ocr_result and ocr_result[0] and len(ocr_result[0]) > 0
-                            else ("", 0)
-                        )
-                        if conf < self.confidence_threshold:
-                            continue
-
-                        plate_numbers_with_info.append(
-                            {
-                                "frame_number": frame_count,
-                                "bounding_box": (x, y, w, h),
-                                "plate_number": plate_number,
-                                "confidence": conf,
-                            }
-                        )
-                        cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
-                        cv2.putText(
-                            frame,
-                            plate_number,
-                            (x, y - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            0.9,
-                            (255, 0, 0),
-                            2,
-                        )
-                        logger.info(
-                            f"Bounding box drawn: ({x}, {y}), ({x + w}, {y + h}), Text: {plate_number}"
-                        )
+        def annotate_and_encode(batch):
+            frame_numbers, frames, frame_detections = batch
+            if progress is not None:
+                progress.advance(
+                    len(frames),
+                    sum(len(readings) for _, readings in frame_detections),
+                )
+            for frame_number, frame, (detections, readings) in zip(
+                frame_numbers, frames, frame_detections
+            ):
+                plate_numbers_with_info.extend(readings)
+                if overlay_frames is not None and detections:
+                    overlay_frames[frame_number] = [
+                        [*detection["bounding_box"], detection["plate_number"]]
+                        for detection in detections
+                    ]
+                if out is None:
+                    continue
 
+                self._annotate_frame(frame, detections)
+
+                if self.display_real_time:
+                    cv2.imshow("License Plate Detection", frame)
+                    if cv2.waitKey(1) & 0xFF == ord("q"):
+                        logger.info(f"User interrupted the process")
+                        raise StopPipeline()
+
+                out.write(frame)
+
+        stages = [
+            ("infer", detect_and_read),
+            ("encode" if out is not None else "collect", annotate_and_encode),
+        ]
+        try:
+            if pipeline_enabled:
+                stage_report = Pipeline(self.pipeline_queue_size).run(
+                    "decode", decode_frames(), stages
+                )
+            else:
+                stage_report = run_sequential("decode", decode_frames(), stages)
+        except Exception:
+            if out is not None:
+                out.abort()
+            raise
+        finally:
+            cap.release()
             if self.display_real_time:
-                cv2.imshow("License Plate Detection", frame)
-                if cv2.waitKey(1) & 0xFF == ord("q"):
-                    logger.info(f"User interrupted the process")
-                    break
+                cv2.destroyAllWindows()
+        logger.info(f"Stage throughput for {inference_uuid}: {stage_report}")
+        logger.info(f"Frame selection for {inference_uuid}: {frame_selector.stats()}")
+        if tracker is not None:
+            logger.info(f"Plate tracking for {inference_uuid}: {tracker.stats()}")
+        if self.ocr_cache is not None:
+            logger.info(f"OCR cache after {inference_uuid}: {self.ocr_cache.stats()}")
+
+        response = {
+            "output_video_path": None,
+            "plate_numbers_with_info": plate_numbers_with_info,
+        }
+
+        if out is not None:
+            # Flush the encoder, the OpenCV backend re-encodes its temp file with FFmpeg here
+            out.finish()
+
+            if not upload_output:
+                # segments are concatenated and uploaded by the caller
+                response["output_video_path"] = output_video_path
+            else:
+                # the streaming encoder already uploaded the fragments while encoding
+                if self.upload_to_s3 and not streams_to_s3:
+                    self.__upload_video_to_s3(inference_uuid)
+                logger.info(
+                    f"Video uploaded to s3://{self.bucket_name}/{output_video_key}"
+                )
+                response["output_video_path"] = (
+                    f"s3://{self.bucket_name}/{output_video_key}"
+                )
+
+        if overlay_frames is not None and self.upload_to_s3:
+            overlay_key = f"{self.s3_upload_path}/{inference_uuid}.overlay.json"
+            self.__upload_overlay_to_s3(
+                input_video_path,
+                output_video_key,
+                overlay_key,
+                {
+                    "fps": source_fps,
+                    "width": frame_width,
+                    "height": frame_height,
+                    "fields": ["x", "y", "w", "h", "plate_number"],
+                    "frames": overlay_frames,
+                },
+            )
+            logger.info(f"Overlay uploaded to s3://{self.bucket_name}/{overlay_key}")
+            response["output_video_path"] = f"s3://{self.bucket_name}/{output_video_key}"
+            response["overlay_path"] = f"s3://{self.bucket_name}/{overlay_key}"
 
-            out.write(frame)
-            frame_count += 1
+        if tracker is not None:
+            response["plate_tracks"] = tracker.summaries()
+        return response
 
-        cap.release()
-        out.release()
-        if self.display_real_time:
-            cv2.destroyAllWindows()
+    def process_stream(self, source, on_readings, max_seconds=None, stop_event=None):
+        """Run detection and OCR on a live source until it ends, max_seconds pass
+        or stop_event is set.
 
-        # Re-encode using FFmpeg
-        self.reencode_video_ffmpeg(output_video_temp_path, output_video_path)
+        Frames are read by a LatestFrameReader, so frames that arrive while
+        the previous one is still being processed are dropped instead of
+        queued. on_readings(frame_number, readings) is called as soon as a
+        frame produced new plate readings. Returns frame counts and the
+        capture to readings latency percentiles.
+        """
+        reader = LatestFrameReader(
+            source, idle_timeout=app_constants.STREAM_IDLE_TIMEOUT
+        )
+        if not reader.start():
+            logger.error(f"Error: Could not open stream {source}")
+            return None
 
-        if self.upload_to_s3:
-            self.__upload_video_to_s3(inference_uuid)
-        logger.info(
-            f"Video uploaded to s3://{self.bucket_name}/{self.s3_upload_path}/{inference_uuid}.mp4"
+        tracker = (
+            PlateTracker(
+                max_age=app_constants.TRACK_MAX_AGE,
+                max_ocr_per_track=app_constants.TRACK_MAX_OCR,
+                keep_finished=False,
+            )
+            if self.tracking_enabled
+            else None
         )
+        latency = LatencyStats()
+        frames_processed = 0
+        readings_count = 0
+        started_at = time.monotonic()
+        try:
+            while not (stop_event is not None and stop_event.is_set()):
+                if max_seconds and time.monotonic() - started_at > max_seconds:
+                    break
+                latest = reader.read(timeout=1.0)
+                if latest is None:
+                    if reader.ended:
+                        break
+                    continue
+
+                frame_number, frame, captured_at = latest
+                frame_height, frame_width = frame.shape[:2]
+                detection_area = {
+                    "x": 0,
+                    "y": 0,
+                    "width": frame_width,
+                    "height": frame_height,
+                }
+                [(_, readings)] = self._detect_and_read_plates(
+                    [frame], [frame_number], detection_area, tracker
+                )
+                latency.add(time.perf_counter() - captured_at)
+                FRAMES.inc()
+                frames_processed += 1
+                if readings:
+                    readings_count += len(readings)
+                    on_readings(frame_number, readings)
+        finally:
+            reader.stop()
+
         response = {
-            "output_video_path": f"s3://{self.bucket_name}/{self.s3_upload_path}/{inference_uuid}.mp4",
-            "plate_numbers_with_info": plate_numbers_with_info,
+            "source": str(source),
+            "frames_processed": frames_processed,
+            **reader.stats(),
+            "readings": readings_count,
+            "latency_ms": latency.percentiles(),
         }
+        if tracker is not None:
+            response["plate_tracking"] = tracker.stats()
+        logger.info(f"Stream {source} finished: {response}")
         return response
 
     def __upload_video_to_s3(self, inference_uuid):
-        s3 = boto3.client("s3")
+        s3 = create_s3_client()
+        start = time.perf_counter()
         s3.upload_file(
             f"{self.disk_upload_path}/{inference_uuid}.mp4",
             self.bucket_name,
             f"{self.s3_upload_path}/{inference_uuid}.mp4",
         )
+        record_s3_transfer(
+            "upload",
+            os.path.getsize(f"{self.disk_upload_path}/{inference_uuid}.mp4"),
+            time.perf_counter() - start,
+        )
         os.remove(f"{self.disk_upload_path}/{inference_uuid}.mp4")
+
+    def __upload_overlay_to_s3(self, input_video_path, video_key, overlay_key, overlay):
+        """Upload the untouched source video with the overlay track next to it"""
+        s3 = create_s3_client()
+        start = time.perf_counter()
+        s3.upload_file(
+            input_video_path,
+            self.bucket_name,
+            video_key,
+            ExtraArgs={"ContentType": "video/mp4"},
+        )
+        record_s3_transfer(
+            "upload", os.path.getsize(input_video_path), time.perf_counter() - start
+        )
+        s3.put_object(
+            Bucket=self.bucket_name,
+            Key=overlay_key,
+            Body=json.dumps(overlay, separators=(",", ":")),
+            ContentType="application/json",
+        )
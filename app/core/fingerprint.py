@@ -0,0 +1,58 @@
+import hashlib
+import json
+import os
+from app.constants import AppConstants as app_constants
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_model_version_cache = {}
+
+
+def save_and_hash(stream, path):
+    """Copy stream to path and return the SHA-256 of the copied bytes"""
+    digest = hashlib.sha256()
+    with open(path, "wb") as f:
+        for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def model_version(model_path=app_constants.MODEL_UPLOAD_TEMP_DIR):
+    """MODEL_VERSION if set, otherwise the hash of the weights file, rehashed only when it changes"""
+    if os.getenv("MODEL_VERSION"):
+        return os.getenv("MODEL_VERSION")
+    try:
+        stat = os.stat(model_path)
+    except OSError:
+        return "unknown"
+    cache_key = (model_path, stat.st_mtime, stat.st_size)
+    if cache_key not in _model_version_cache:
+        _model_version_cache.clear()
+        _model_version_cache[cache_key] = hash_file(model_path)
+    return _model_version_cache[cache_key]
+
+
+def settings_fingerprint(options):
+    """Hash of the job options and every setting that changes the inference output"""
+    settings = {
+        "options": options,
+        "model_conf": os.environ.get("MODEL_CONF") or 0.5,
+        "ocr_mode": app_constants.OCR_MODE,
+        "ocr_use_angle_cls": app_constants.OCR_USE_ANGLE_CLS,
+        "detection_stride": app_constants.DETECTION_STRIDE,
+        "motion_threshold": app_constants.MOTION_THRESHOLD,
+        "motion_max_skipped": app_constants.MOTION_MAX_SKIPPED,
+        "tracking_enabled": app_constants.TRACKING_ENABLED,
+        "track_max_age": app_constants.TRACK_MAX_AGE,
+        "track_max_ocr": app_constants.TRACK_MAX_OCR,
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
@@ -0,0 +1,64 @@
+import cv2
+
+
+class FrameSelector:
+    """Decides which decoded frames are worth sending to the detector.
+
+    Only every stride-th frame is considered. If a motion threshold is set,
+    a candidate is also skipped unless its downscaled grayscale image differs
+    from the last selected frame by more than the threshold (mean absolute
+    difference, 0-255). After max_skipped skipped frames the next candidate
+    is always selected, so detections can't go stale forever.
+    """
+
+    def __init__(self, stride=1, motion_threshold=0.0, motion_width=64, max_skipped=0):
+        self.stride = max(1, stride)
+        self.motion_threshold = motion_threshold
+        self.motion_width = motion_width
+        self.max_skipped = max_skipped
+        self.selected_frames = 0
+        self.skipped_frames = 0
+        self._last_signature = None
+        self._skipped_since_selected = 0
+
+    def select(self, frame_number, frame):
+        if frame_number % self.stride != 0:
+            return self._skip()
+
+        if self.motion_threshold > 0:
+            signature = self._signature(frame)
+            if (
+                self._last_signature is not None
+                and not self._refresh_due()
+                and cv2.absdiff(signature, self._last_signature).mean()
+                <= self.motion_threshold
+            ):
+                return self._skip()
+            self._last_signature = signature
+
+        self.selected_frames += 1
+        self._skipped_since_selected = 0
+        return True
+
+    def stats(self):
+        return {
+            "selected_frames": self.selected_frames,
+            "skipped_frames": self.skipped_frames,
+        }
+
+    def _skip(self):
+        self.skipped_frames += 1
+        self._skipped_since_selected += 1
+        return False
+
+    def _refresh_due(self):
+        return 0 < self.max_skipped <= self._skipped_since_selected
+
+    def _signature(self, frame):
+        height, width = frame.shape[:2]
+        small = cv2.resize(
+            frame,
+            (self.motion_width, max(1, height * self.motion_width // width)),
+            interpolation=cv2.INTER_AREA,
+        )
+        return cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (3, 3), 0)
@@ -0,0 +1,86 @@
+from app.core.plate_index import normalize_plate
+
+DETECTION_COLUMNS = [
+    "frame_number",
+    "x",
+    "y",
+    "w",
+    "h",
+    "plate_number",
+    "confidence",
+    "track_id",
+]
+
+
+def filter_detections(
+    detections,
+    frame_start=None,
+    frame_end=None,
+    min_confidence=None,
+    plate=None,
+    dedupe=False,
+):
+    """Detections inside [frame_start, frame_end] with at least min_confidence.
+
+    plate keeps the readings of that plate, ignoring case, separators and
+    characters OCR confuses. dedupe keeps only the most confident reading of
+    each plate, with the frame range and number of frames it was seen in.
+    """
+    normalized_plate = normalize_plate(plate) if plate else None
+    filtered = [
+        detection
+        for detection in detections
+        if (frame_start is None or detection["frame_number"] >= frame_start)
+        and (frame_end is None or detection["frame_number"] <= frame_end)
+        and (min_confidence is None or detection["confidence"] >= min_confidence)
+        and (
+            normalized_plate is None
+            or normalize_plate(detection["plate_number"]) == normalized_plate
+        )
+    ]
+    if dedupe:
+        filtered = dedupe_by_plate(filtered)
+    return filtered
+
+
+def dedupe_by_plate(detections):
+    best = {}
+    for detection in detections:
+        plate_number = detection["plate_number"]
+        seen = best.get(plate_number)
+        if seen is None:
+            best[plate_number] = dict(
+                detection,
+                first_frame=detection["frame_number"],
+                last_frame=detection["frame_number"],
+                occurrences=1,
+            )
+            continue
+        summary = {
+            "first_frame": min(seen["first_frame"], detection["frame_number"]),
+            "last_frame": max(seen["last_frame"], detection["frame_number"]),
+            "occurrences": seen["occurrences"] + 1,
+        }
+        if detection["confidence"] > seen["confidence"]:
+            seen = dict(detection)
+        best[plate_number] = dict(seen, **summary)
+    return sorted(best.values(), key=lambda d: d["first_frame"])
+
+
+def to_columns(detections):
+    """Columnar form of detections: one list per field instead of one dict per detection"""
+    columns = {name: [] for name in DETECTION_COLUMNS}
+    for detection in detections:
+        x, y, w, h = detection["bounding_box"]
+        columns["frame_number"].append(detection["frame_number"])
+        columns["x"].append(x)
+        columns["y"].append(y)
+        columns["w"].append(w)
+        columns["h"].append(h)
+        columns["plate_number"].append(detection["plate_number"])
+        columns["confidence"].append(detection["confidence"])
+        columns["track_id"].append(detection.get("track_id"))
+    if detections and "occurrences" in detections[0]:
+        for name in ("first_frame", "last_frame", "occurrences"):
+            columns[name] = [detection[name] for detection in detections]
+    return columns
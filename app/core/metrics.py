@@ -0,0 +1,176 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Histogram, multiprocess
+except ImportError:  # optional, every metric below becomes a no-op without it
+    prometheus_client = None
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = (
+    prometheus_client.CONTENT_TYPE_LATEST
+    if prometheus_client is not None
+    else "text/plain; charset=utf-8"
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+JOB_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+
+def _histogram(name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+    if prometheus_client is None:
+        return _NoopMetric()
+    return Histogram(name, documentation, labelnames, buckets=buckets)
+
+
+def _counter(name, documentation, labelnames=()):
+    if prometheus_client is None:
+        return _NoopMetric()
+    return Counter(name, documentation, labelnames)
+
+
+HTTP_REQUEST_SECONDS = _histogram(
+    "mesos_http_request_seconds",
+    "API request latency",
+    ("namespace", "method", "status"),
+)
+UPLOAD_BYTES = _counter(
+    "mesos_upload_bytes_total",
+    "Video bytes received by the API",
+    ("endpoint",),
+)
+QUEUE_WAIT_SECONDS = _histogram(
+    "mesos_task_queue_wait_seconds",
+    "Time between publishing a task and a worker starting it",
+    ("task",),
+    buckets=JOB_BUCKETS,
+)
+MODEL_LOAD_SECONDS = _histogram(
+    "mesos_model_load_seconds",
+    "Time to load and to warm up the models",
+    ("phase",),
+    buckets=JOB_BUCKETS,
+)
+STAGE_SECONDS = _histogram(
+    "mesos_pipeline_stage_seconds",
+    "Time a pipeline stage spent on one batch of frames",
+    ("stage",),
+)
+FRAMES = _counter(
+    "mesos_frames_total",
+    "Frames processed by inference jobs",
+)
+OCR_CROPS = _counter(
+    "mesos_ocr_crops_total",
+    "Plate crops read, by OCR or from the OCR cache; divide by mesos_frames_total "
+    "for OCR calls per frame",
+    ("source",),
+)
+FFMPEG_SECONDS = _histogram(
+    "mesos_ffmpeg_seconds",
+    "Duration of ffmpeg runs",
+    ("operation",),
+    buckets=JOB_BUCKETS,
+)
+S3_TRANSFER_BYTES = _counter(
+    "mesos_s3_transfer_bytes_total",
+    "Bytes transferred to and from S3",
+    ("direction",),
+)
+S3_TRANSFER_SECONDS = _counter(
+    "mesos_s3_transfer_seconds_total",
+    "Time spent transferring to and from S3; bytes over seconds is the throughput",
+    ("direction",),
+)
+
+
+@contextmanager
+def timed(histogram, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - start)
+
+
+def record_s3_transfer(direction, num_bytes, seconds):
+    S3_TRANSFER_BYTES.labels(direction=direction).inc(num_bytes)
+    S3_TRANSFER_SECONDS.labels(direction=direction).inc(seconds)
+
+
+def _registry():
+    """Registry to expose: all processes' metrics in multiprocess mode
+    (PROMETHEUS_MULTIPROC_DIR set), this process' otherwise"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return prometheus_client.REGISTRY
+
+
+def render_metrics():
+    """(body, content type) of the metrics page"""
+    if prometheus_client is None:
+        return "# prometheus_client is not installed\n", CONTENT_TYPE
+    return prometheus_client.generate_latest(_registry()), CONTENT_TYPE
+
+
+def start_metrics_server(port):
+    if prometheus_client is None:
+        logger.warning("prometheus_client is not installed, not serving metrics")
+        return
+    prometheus_client.start_http_server(port, registry=_registry())
+    logger.info(f"Serving metrics on port {port}")
+
+
+def mark_process_dead(pid):
+    if prometheus_client is not None and os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
+
+
+def init_app_metrics(app):
+    """Time every request by API namespace and serve /metrics"""
+    from flask import Response, g, request
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started_at = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started_at = g.pop("request_started_at", None)
+        if started_at is not None:
+            HTTP_REQUEST_SECONDS.labels(
+                namespace=_namespace(request.path),
+                method=request.method,
+                status=response.status_code,
+            ).observe(time.perf_counter() - started_at)
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        body, content_type = render_metrics()
+        return Response(body, content_type=content_type)
+
+
+def _namespace(path):
+    # /<version>/api/<namespace>/... -> namespace, so the label stays low cardinality
+    parts = path.strip("/").split("/")
+    if len(parts) >= 3 and parts[1] == "api":
+        return parts[2]
+    return "other"
@@ -0,0 +1,74 @@
+import logging
+import os
+import threading
+import time
+from app.constants import AppConstants as app_constants
+from app.core.metrics import MODEL_LOAD_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """Holds one warmed InferenceManager for the lifetime of a worker process"""
+
+    def __init__(self, model_path=app_constants.MODEL_UPLOAD_TEMP_DIR):
+        self.model_path = model_path
+        self.load_time = None
+        self.warmup_time = None
+        self._manager = None
+        self._model_mtime = None
+        self._lock = threading.Lock()
+
+    def get_inference_manager(self):
+        """Return the cached manager, reloading it if the weights file changed"""
+        with self._lock:
+            if self._manager is None or self._weights_changed():
+                self._load()
+            return self._manager
+
+    def stats(self):
+        return {
+            "model_path": self.model_path,
+            "model_mtime": self._model_mtime,
+            "load_time": self.load_time,
+            "warmup_time": self.warmup_time,
+        }
+
+    def _weights_mtime(self):
+        try:
+            return os.path.getmtime(self.model_path)
+        except OSError:
+            return None
+
+    def _weights_changed(self):
+        mtime = self._weights_mtime()
+        return mtime is not None and mtime != self._model_mtime
+
+    def _load(self):
+        from app.core.InferenceManager import InferenceManager
+
+        reloading = self._manager is not None
+        mtime = self._weights_mtime()
+        if reloading and self._manager.ocr_cache is not None:
+            # the shelve file is locked while open, the new manager reopens it
+            self._manager.ocr_cache.close()
+
+        start = time.perf_counter()
+        manager = InferenceManager()
+        self.load_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        manager.warmup()
+        self.warmup_time = time.perf_counter() - start
+
+        self._manager = manager
+        self._model_mtime = mtime
+        MODEL_LOAD_SECONDS.labels(phase="load").observe(self.load_time)
+        MODEL_LOAD_SECONDS.labels(phase="warmup").observe(self.warmup_time)
+        logger.info(
+            f"{'Reloaded' if reloading else 'Loaded'} models from {self.model_path} "
+            f"(load: {self.load_time:.2f}s, warmup: {self.warmup_time:.2f}s)"
+        )
+
+
+model_registry = ModelRegistry()
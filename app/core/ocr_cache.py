@@ -0,0 +1,91 @@
+import logging
+import os
+import shelve
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def perceptual_hash(plate_crop, hash_width=32, hash_height=8):
+    """Difference hash of the contrast-normalized grayscale crop, plus its aspect ratio.
+
+    The grid is as wide as a plate, a few columns per character; a square 8x8
+    grid gives a character about one column and maps plates that differ in a
+    single character to the same key.
+    """
+    height, width = plate_crop.shape[:2]
+    gray = cv2.equalizeHist(cv2.cvtColor(plate_crop, cv2.COLOR_BGR2GRAY))
+    small = cv2.resize(
+        gray, (hash_width + 1, hash_height), interpolation=cv2.INTER_AREA
+    )
+    bits = np.packbits(small[:, 1:] > small[:, :-1]).tobytes().hex()
+    return f"{bits}:{round(width / max(1, height), 1)}"
+
+
+class OCRCache:
+    """Bounded LRU cache of OCR readings keyed by the perceptual hash of the crop.
+
+    With a disk_dir every reading is also written to a per-process shelve
+    file, which is consulted on memory misses and survives model reloads.
+    """
+
+    def __init__(self, max_entries=4096, disk_dir=None):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk = shelve.open(os.path.join(disk_dir, f"ocr_cache_{os.getpid()}"))
+
+    def get(self, key):
+        with self._lock:
+            reading = self._entries.get(key)
+            if reading is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return reading
+
+            if self._disk is not None and key in self._disk:
+                reading = self._disk[key]
+                self._remember(key, reading)
+                self.disk_hits += 1
+                return reading
+
+            self.misses += 1
+            return None
+
+    def put(self, key, reading):
+        with self._lock:
+            self._remember(key, reading)
+            if self._disk is not None:
+                self._disk[key] = reading
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (
+                round((self.hits + self.disk_hits) / lookups, 3) if lookups else None
+            ),
+        }
+
+    def close(self):
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+    def _remember(self, key, reading):
+        self._entries[key] = reading
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,192 @@
+import logging
+import queue
+import threading
+import time
+from app.core.metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class StopPipeline(Exception):
+    """Raised by a stage to end the pipeline early without an error"""
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy_time = 0.0
+
+    def add(self, elapsed):
+        self.items += 1
+        self.busy_time += elapsed
+        STAGE_SECONDS.labels(stage=self.name).observe(elapsed)
+
+    def to_dict(self, wall_time):
+        return {
+            "items": self.items,
+            "busy_time": round(self.busy_time, 3),
+            "items_per_second": (
+                round(self.items / self.busy_time, 2) if self.busy_time else None
+            ),
+            "utilization": round(self.busy_time / wall_time, 3) if wall_time else None,
+        }
+
+
+class Pipeline:
+    """Runs a source and a chain of stages concurrently, one thread per stage.
+
+    Stages are connected by bounded queues, so a slow stage blocks the ones
+    before it instead of letting frames pile up in memory. Each stage
+    handles its items one at a time in arrival order, so the output order
+    matches the source order.
+    """
+
+    def __init__(self, queue_size=8, poll_interval=0.1):
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self.stats = {}
+        self._stop = threading.Event()
+        self._error = None
+        self._error_lock = threading.Lock()
+
+    def run(self, source_name, source, stages):
+        """Feed items from source through stages, a list of (name, fn) tuples.
+
+        Each fn receives the item produced by the previous stage and returns
+        the item for the next one; the return value of the last stage is
+        ignored. Re-raises the first stage error after all threads stopped and
+        returns the per-stage throughput report.
+        """
+        self.stats = {source_name: StageStats(source_name)}
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in stages]
+        threads = [
+            threading.Thread(
+                target=self._run_source,
+                args=(source, queues[0], self.stats[source_name]),
+                name=f"pipeline-{source_name}",
+                daemon=True,
+            )
+        ]
+        for index, (name, fn) in enumerate(stages):
+            self.stats[name] = StageStats(name)
+            output_queue = queues[index + 1] if index + 1 < len(stages) else None
+            threads.append(
+                threading.Thread(
+                    target=self._run_stage,
+                    args=(fn, queues[index], output_queue, self.stats[name]),
+                    name=f"pipeline-{name}",
+                    daemon=True,
+                )
+            )
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_time = time.perf_counter() - start
+
+        report = {
+            name: stats.to_dict(wall_time) for name, stats in self.stats.items()
+        }
+        logger.info(f"Pipeline finished in {wall_time:.2f}s, stages: {report}")
+        if self._error is not None:
+            raise self._error
+        return report
+
+    def stop(self):
+        self._stop.set()
+
+    def _fail(self, error):
+        with self._error_lock:
+            if self._error is None:
+                self._error = error
+        logger.error(f"Pipeline stage failed: {error!r}")
+        self._stop.set()
+
+    def _put(self, output_queue, item):
+        while not self._stop.is_set():
+            try:
+                output_queue.put(item, timeout=self.poll_interval)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, input_queue):
+        while not self._stop.is_set():
+            try:
+                return input_queue.get(timeout=self.poll_interval)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _run_source(self, source, output_queue, stats):
+        try:
+            iterator = iter(source)
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                stats.add(time.perf_counter() - start)
+                if not self._put(output_queue, item):
+                    return
+        except StopPipeline:
+            self.stop()
+            return
+        except Exception as e:
+            self._fail(e)
+            return
+        self._put(output_queue, _END)
+
+    def _run_stage(self, fn, input_queue, output_queue, stats):
+        while True:
+            item = self._get(input_queue)
+            if item is _END:
+                break
+            start = time.perf_counter()
+            try:
+                result = fn(item)
+            except StopPipeline:
+                self.stop()
+                return
+            except Exception as e:
+                self._fail(e)
+                return
+            stats.add(time.perf_counter() - start)
+            if output_queue is not None and not self._put(output_queue, result):
+                return
+        if output_queue is not None:
+            self._put(output_queue, _END)
+
+
+def run_sequential(source_name, source, stages):
+    """Run the same source and stages as Pipeline.run, one item at a time in the calling thread"""
+    stats = {source_name: StageStats(source_name)}
+    for name, _ in stages:
+        stats[name] = StageStats(name)
+
+    start = time.perf_counter()
+    iterator = iter(source)
+    try:
+        while True:
+            stage_start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            stats[source_name].add(time.perf_counter() - stage_start)
+            for name, fn in stages:
+                stage_start = time.perf_counter()
+                item = fn(item)
+                stats[name].add(time.perf_counter() - stage_start)
+    except StopPipeline:
+        pass
+    wall_time = time.perf_counter() - start
+
+    return {name: stage_stats.to_dict(wall_time) for name, stage_stats in stats.items()}
@@ -0,0 +1,162 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# characters OCR commonly reads for one another, folded onto a single symbol
+CONFUSABLE_CHARACTERS = str.maketrans({"O": "0", "I": "1", "B": "8", "S": "5"})
+
+
+def normalize_plate(plate_number):
+    """Upper-case alphanumerics of the plate with confusable characters folded together"""
+    plate = "".join(c for c in str(plate_number).upper() if c.isalnum())
+    return plate.translate(CONFUSABLE_CHARACTERS)
+
+
+def edit_distance(a, b):
+    """Levenshtein distance between two strings"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_a != char_b),
+                )
+            )
+        previous = current
+    return previous[-1]
+
+
+def deletion_variants(word, max_deletions):
+    """word and every string obtained by deleting up to max_deletions characters from it"""
+    variants = {word}
+    frontier = {word}
+    for _ in range(max_deletions):
+        frontier = {
+            variant[:i] + variant[i + 1 :]
+            for variant in frontier
+            for i in range(len(variant))
+        }
+        variants |= frontier
+    return variants
+
+
+class DeletionIndex:
+    """Symmetric deletion index over strings.
+
+    Two strings within edit distance d always share a variant with at most
+    d characters deleted from each, so a lookup only hashes the deletion
+    variants of the query and verifies the few words they point to, instead
+    of comparing the query against every indexed word.
+    """
+
+    def __init__(self, max_distance):
+        self.max_distance = max_distance
+        self._variants = {}  # deletion variant -> words
+
+    def add(self, word):
+        for variant in deletion_variants(word, self.max_distance):
+            self._variants.setdefault(variant, set()).add(word)
+
+    def search(self, word, max_distance):
+        """[(word, distance)] of all words within max_distance of word"""
+        max_distance = min(max_distance, self.max_distance)
+        candidates = set()
+        for variant in deletion_variants(word, max_distance):
+            candidates |= self._variants.get(variant, set())
+        matches = []
+        for candidate in candidates:
+            if abs(len(candidate) - len(word)) > max_distance:
+                continue
+            distance = edit_distance(word, candidate)
+            if distance <= max_distance:
+                matches.append((candidate, distance))
+        return matches
+
+
+class FuzzyPlateIndex:
+    """In-process index of every recognized plate number, tolerant to OCR errors.
+
+    Plates are indexed by their normalized form in a DeletionIndex, which
+    answers queries up to max_distance edits. loader(after_id)
+    must return (high water mark, plate numbers stored after after_id); each
+    refresh only loads plates added since the last one. Detections committed
+    out of id order by concurrent jobs can be skipped by a refresh, so the
+    index is rebuilt from scratch every rebuild_interval seconds.
+    """
+
+    def __init__(self, loader, max_distance=2, rebuild_interval=300):
+        self.loader = loader
+        self.max_distance = max_distance
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.Lock()  # guards the index against concurrent searches
+        self._refresh_lock = threading.Lock()
+        self._index = DeletionIndex(max_distance)
+        self._plates = {}  # normalized form -> raw plate numbers
+        self._high_water_mark = 0
+        self._built_at = None
+
+    def refresh(self):
+        """Load the plates stored since the last refresh, or rebuild the index when it is due.
+
+        A rebuild fills a new index and swaps it in, so searches keep using
+        the old one meanwhile.
+        """
+        with self._refresh_lock:
+            if (
+                self._built_at is None
+                or time.monotonic() - self._built_at > self.rebuild_interval
+            ):
+                start = time.perf_counter()
+                index, plates = DeletionIndex(self.max_distance), {}
+                high_water_mark, plate_numbers = self.loader(0)
+                self._add(index, plates, plate_numbers)
+                with self._lock:
+                    self._index, self._plates = index, plates
+                    self._high_water_mark = high_water_mark or 0
+                self._built_at = time.monotonic()
+                logger.info(
+                    f"Built plate index of {len(plates)} plates in {time.perf_counter() - start:.2f}s"
+                )
+                return
+
+            high_water_mark, plate_numbers = self.loader(self._high_water_mark)
+            with self._lock:
+                self._add(self._index, self._plates, plate_numbers)
+                if high_water_mark is not None:
+                    self._high_water_mark = max(self._high_water_mark, high_water_mark)
+
+    def search(self, plate_number, max_distance=1):
+        """[{plate_number, distance}] of indexed plates within max_distance, closest first"""
+        with self._lock:
+            matches = self._index.search(normalize_plate(plate_number), max_distance)
+            candidates = [
+                {"plate_number": candidate, "distance": distance}
+                for normalized, distance in matches
+                for candidate in self._plates[normalized]
+            ]
+        return sorted(candidates, key=lambda c: (c["distance"], c["plate_number"]))
+
+    def stats(self):
+        return {
+            "plates": sum(len(plates) for plates in self._plates.values()),
+            "normalized_plates": len(self._plates),
+            "high_water_mark": self._high_water_mark,
+        }
+
+    @staticmethod
+    def _add(index, plates, plate_numbers):
+        for plate_number in plate_numbers:
+            normalized = normalize_plate(plate_number)
+            if not normalized:
+                continue
+            if normalized not in plates:
+                plates[normalized] = set()
+                index.add(normalized)
+            plates[normalized].add(plate_number)
@@ -0,0 +1,178 @@
+import cv2
+
+
+def box_iou(box_a, box_b):
+    ax, ay, aw, ah = box_a
+    bx, by, bw, bh = box_b
+    inter_w = min(ax + aw, bx + bw) - max(ax, bx)
+    inter_h = min(ay + ah, by + bh) - max(ay, by)
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    intersection = inter_w * inter_h
+    return intersection / float(aw * ah + bw * bh - intersection)
+
+
+def centroid_distance(box_a, box_b):
+    """Distance between box centres, relative to the diagonal of box_a"""
+    ax, ay, aw, ah = box_a
+    bx, by, bw, bh = box_b
+    dx = (ax + aw / 2) - (bx + bw / 2)
+    dy = (ay + ah / 2) - (by + bh / 2)
+    return (dx * dx + dy * dy) ** 0.5 / max(1.0, (aw * aw + ah * ah) ** 0.5)
+
+
+def plate_sharpness(plate_crop):
+    """Variance of the Laplacian, higher means a sharper crop"""
+    gray = cv2.cvtColor(plate_crop, cv2.COLOR_BGR2GRAY)
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+class PlateTrack:
+    def __init__(self, track_id, frame_number, box):
+        self.track_id = track_id
+        self.box = box
+        self.first_frame = frame_number
+        self.last_frame = frame_number
+        self.ocr_count = 0
+        self.best_sharpness = 0.0
+        self.votes = {}  # plate number -> [confidence sum, reading count]
+
+    def update(self, frame_number, box):
+        self.box = box
+        self.last_frame = frame_number
+
+    def add_reading(self, plate_number, conf):
+        vote = self.votes.setdefault(plate_number, [0.0, 0])
+        vote[0] += conf
+        vote[1] += 1
+
+    @property
+    def reading(self):
+        """Confidence-weighted vote over all readings, as (plate_number, mean confidence)"""
+        if not self.votes:
+            return None
+        plate_number, (conf_sum, count) = max(
+            self.votes.items(), key=lambda item: item[1][0]
+        )
+        return plate_number, conf_sum / count
+
+    def summary(self):
+        plate_number, conf = self.reading
+        return {
+            "track_id": self.track_id,
+            "plate_number": plate_number,
+            "confidence": conf,
+            "first_frame": self.first_frame,
+            "last_frame": self.last_frame,
+            "ocr_count": self.ocr_count,
+        }
+
+
+class PlateTracker:
+    """Greedy IoU / centroid tracker that decides when a plate needs OCR.
+
+    Each detection is matched to the live track it overlaps most, falling
+    back to the nearest centre for fast moving plates. A track is OCR'd on
+    its first sighting and again only when a noticeably sharper crop shows
+    up, at most max_ocr_per_track times. Without keep_finished, tracks are
+    forgotten once they expire, which keeps memory flat on endless streams.
+    """
+
+    def __init__(
+        self,
+        iou_threshold=0.3,
+        max_centroid_distance=1.0,
+        max_age=15,
+        max_ocr_per_track=3,
+        sharpness_gain=1.2,
+        keep_finished=True,
+    ):
+        self.iou_threshold = iou_threshold
+        self.max_centroid_distance = max_centroid_distance
+        self.max_age = max_age
+        self.max_ocr_per_track = max_ocr_per_track
+        self.sharpness_gain = sharpness_gain
+        self.keep_finished = keep_finished
+        self.tracks = {}
+        self.ocr_calls = 0
+        self.detections = 0
+        self._active = []
+        self._next_track_id = 1
+
+    def update(self, frame_number, boxes):
+        """Assign the boxes of a frame to tracks and return the track of each box"""
+        active = []
+        for track in self._active:
+            if frame_number - track.last_frame <= self.max_age:
+                active.append(track)
+            elif not self.keep_finished:
+                del self.tracks[track.track_id]
+        self._active = active
+        self.detections += len(boxes)
+
+        candidates = sorted(
+            (
+                (box_iou(track.box, box), track_index, box_index)
+                for track_index, track in enumerate(self._active)
+                for box_index, box in enumerate(boxes)
+            ),
+            reverse=True,
+        )
+        assigned = [None] * len(boxes)
+        used_tracks = set()
+        for iou, track_index, box_index in candidates:
+            if iou < self.iou_threshold:
+                break
+            if track_index in used_tracks or assigned[box_index] is not None:
+                continue
+            used_tracks.add(track_index)
+            assigned[box_index] = self._active[track_index]
+
+        for box_index, box in enumerate(boxes):
+            if assigned[box_index] is not None:
+                continue
+            nearest = min(
+                (
+                    (centroid_distance(track.box, box), track_index)
+                    for track_index, track in enumerate(self._active)
+                    if track_index not in used_tracks
+                ),
+                default=None,
+            )
+            if nearest is not None and nearest[0] <= self.max_centroid_distance:
+                used_tracks.add(nearest[1])
+                assigned[box_index] = self._active[nearest[1]]
+
+        for box_index, box in enumerate(boxes):
+            track = assigned[box_index]
+            if track is None:
+                track = PlateTrack(self._next_track_id, frame_number, box)
+                self._next_track_id += 1
+                self.tracks[track.track_id] = track
+                self._active.append(track)
+                assigned[box_index] = track
+            else:
+                track.update(frame_number, box)
+        return assigned
+
+    def claim_ocr(self, track, sharpness):
+        """Return True and reserve an OCR call if this crop should be read"""
+        if track.ocr_count > 0 and (
+            track.ocr_count >= self.max_ocr_per_track
+            or sharpness <= track.best_sharpness * self.sharpness_gain
+        ):
+            return False
+        track.ocr_count += 1
+        track.best_sharpness = max(track.best_sharpness, sharpness)
+        self.ocr_calls += 1
+        return True
+
+    def summaries(self):
+        return [track.summary() for track in self.tracks.values() if track.votes]
+
+    def stats(self):
+        return {
+            "tracks": len(self.tracks),
+            "detections": self.detections,
+            "ocr_calls": self.ocr_calls,
+        }
@@ -0,0 +1,28 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def profiled(profile_path, top=20):
+    """Profile the block with cProfile and dump the stats to profile_path, also
+    when the block raises. cProfile only sees the calling thread."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(profile_path), exist_ok=True)
+        profiler.dump_stats(profile_path)
+
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(
+            top
+        )
+        logger.info(f"Profile saved to {profile_path}:\n{summary.getvalue()}")
@@ -0,0 +1,45 @@
+import threading
+import time
+
+
+class ProgressReporter:
+    """Counts processed frames and passes a progress snapshot to callback at most
+    once per interval seconds, so publishing never slows the pipeline down"""
+
+    def __init__(self, callback, total_frames=None, interval=1.0):
+        self.callback = callback
+        self.total_frames = total_frames or None  # 0 when the container doesn't say
+        self.interval = interval
+        self.frames_done = 0
+        self.detections = 0
+        self._started_at = time.perf_counter()
+        self._published_at = None
+        self._lock = threading.Lock()
+
+    def advance(self, frames, detections=0):
+        with self._lock:
+            self.frames_done += frames
+            self.detections += detections
+            now = time.perf_counter()
+            if (
+                self._published_at is not None
+                and now - self._published_at < self.interval
+            ):
+                return
+            self._published_at = now
+            snapshot = self.snapshot()
+        self.callback(snapshot)
+
+    def snapshot(self):
+        elapsed = time.perf_counter() - self._started_at
+        fps = self.frames_done / elapsed if elapsed > 0 else None
+        eta = None
+        if fps and self.total_frames:
+            eta = max(0, self.total_frames - self.frames_done) / fps
+        return {
+            "frames_done": self.frames_done,
+            "total_frames": self.total_frames,
+            "fps": round(fps, 2) if fps else None,
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "detections": self.detections,
+        }
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class RangeCache:
+    """Bounded on-disk cache of video byte ranges.
+
+    Entries are keyed by object key, ETag and the requested range, so a
+    re-uploaded object never serves stale bytes. When the directory grows
+    past max_bytes the least recently used entries are deleted.
+    """
+
+    def __init__(self, directory, max_bytes, max_entry_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._evict_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, file_key, etag, range_header):
+        """Return (headers, data path) of a cached range, or None"""
+        data_path, meta_path = self._paths(file_key, etag, range_header)
+        try:
+            with open(meta_path) as f:
+                headers = json.load(f)
+            os.utime(data_path)  # mark as recently used
+        except (OSError, ValueError):
+            return None
+        return headers, data_path
+
+    def accepts(self, content_length):
+        return content_length is not None and content_length <= self.max_entry_bytes
+
+    def writer(self, file_key, etag, range_header, headers):
+        data_path, meta_path = self._paths(file_key, etag, range_header)
+        return _RangeCacheWriter(self, data_path, meta_path, headers)
+
+    def _paths(self, file_key, etag, range_header):
+        digest = hashlib.sha256(
+            f"{file_key}|{etag}|{range_header or ''}".encode()
+        ).hexdigest()
+        data_path = os.path.join(self.directory, f"{digest}.bin")
+        return data_path, f"{data_path}.json"
+
+    def _evict(self):
+        with self._evict_lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.directory):
+                if not name.endswith(".bin"):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                for stale_path in (f"{path}.json", path):
+                    try:
+                        os.remove(stale_path)
+                    except OSError:
+                        pass
+                total -= size
+
+
+class _RangeCacheWriter:
+    """Collects streamed bytes in a temp file and publishes them only when complete"""
+
+    def __init__(self, cache, data_path, meta_path, headers):
+        self.cache = cache
+        self.data_path = data_path
+        self.meta_path = meta_path
+        self.headers = headers
+        self._temp_path = f"{data_path}.{uuid.uuid4().hex}.tmp"
+        self._file = open(self._temp_path, "wb")
+
+    def write(self, chunk):
+        self._file.write(chunk)
+
+    def commit(self):
+        self._file.close()
+        os.replace(self._temp_path, self.data_path)
+        meta_temp_path = f"{self._temp_path}.json"
+        with open(meta_temp_path, "w") as f:
+            json.dump(self.headers, f)
+        os.replace(meta_temp_path, self.meta_path)
+        self.cache._evict()
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.remove(self._temp_path)
+        except OSError:
+            pass
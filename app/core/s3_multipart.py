@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.core.metrics import record_s3_transfer
+from app.core.s3_utils import create_s3_client
+
+logger = logging.getLogger(__name__)
+
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3 rejects smaller parts except the last one
+
+
+class MultipartUploadSink:
+    """File-like sink that uploads everything written to it as an S3 multipart upload.
+
+    Parts are uploaded in parallel while more data is still being written.
+    At most max_pending parts are buffered or in flight at once, so memory
+    stays bounded by roughly part_size * (max_pending + 1); writers block
+    when the uploads fall behind. Any failure aborts the multipart upload so
+    no orphaned parts are left in the bucket.
+    """
+
+    def __init__(
+        self,
+        bucket_name,
+        key,
+        part_size=8 * 1024 * 1024,
+        max_pending=4,
+        content_type="video/mp4",
+    ):
+        self.bucket_name = bucket_name
+        self.key = key
+        self.part_size = max(MIN_PART_SIZE, part_size)
+        self.bytes_written = 0
+        self._s3 = create_s3_client()
+        self._buffer = bytearray()
+        self._parts = []
+        self._futures = []
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=max_pending)
+        self._closed = False
+        self._upload_id = self._s3.create_multipart_upload(
+            Bucket=bucket_name, Key=key, ContentType=content_type
+        )["UploadId"]
+
+    def write(self, data):
+        self._buffer.extend(data)
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self.part_size:
+            self._submit_part(bytes(self._buffer[: self.part_size]))
+            del self._buffer[: self.part_size]
+        return len(data)
+
+    def close(self):
+        """Upload the remaining bytes and complete the multipart upload"""
+        if self._closed:
+            return
+        try:
+            if self._buffer or not self._futures:
+                self._submit_part(bytes(self._buffer))
+                self._buffer.clear()
+            for future in self._futures:
+                future.result()
+            self._s3.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=self.key,
+                UploadId=self._upload_id,
+                MultipartUpload={
+                    "Parts": sorted(self._parts, key=lambda part: part["PartNumber"])
+                },
+            )
+        except Exception:
+            self.abort()
+            raise
+        self._closed = True
+        self._executor.shutdown()
+        logger.info(
+            f"Uploaded {self.bytes_written} bytes to s3://{self.bucket_name}/{self.key} in {len(self._parts)} parts"
+        )
+
+    def abort(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._executor.shutdown(cancel_futures=True)
+        try:
+            self._s3.abort_multipart_upload(
+                Bucket=self.bucket_name, Key=self.key, UploadId=self._upload_id
+            )
+        except Exception as e:
+            logger.error(f"Could not abort multipart upload of {self.key}: {e}")
+
+    def _submit_part(self, body):
+        # fail fast if an earlier part already failed
+        for future in self._futures:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+        self._slots.acquire()
+        part_number = len(self._futures) + 1
+        future = self._executor.submit(self._upload_part, part_number, body)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def _upload_part(self, part_number, body):
+        start = time.perf_counter()
+        response = self._s3.upload_part(
+            Bucket=self.bucket_name,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        record_s3_transfer("upload", len(body), time.perf_counter() - start)
+        self._parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
@@ -1,20 +1,70 @@
+import logging
+import os
+import threading
+import time
 import boto3
 import botocore
+from botocore.config import Config
+from app.core.metrics import record_s3_transfer
+
+logger = logging.getLogger(__name__)
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+_metadata_cache = {}
+METADATA_TTL_SECONDS = 30
+METADATA_CACHE_SIZE = 1024
+
+
+def create_s3_client(max_pool_connections=None):
+    # S3_ENDPOINT_URL points boto3 at a local S3 stand-in such as MinIO
+    config = (
+        Config(max_pool_connections=max_pool_connections)
+        if max_pool_connections
+        else None
+    )
+    return boto3.client(
+        "s3", endpoint_url=os.getenv("S3_ENDPOINT_URL") or None, config=config
+    )
+
+
+def get_shared_s3_client():
+    """Process-wide client whose connection pool is reused by every request thread"""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                _shared_client = create_s3_client(
+                    max_pool_connections=int(
+                        os.getenv("S3_MAX_POOL_CONNECTIONS", "32")
+                    )
+                )
+    return _shared_client
 
 
 def download_video_from_s3(bucket_name, s3_download_path, disk_download_path):
-    s3 = boto3.client("s3")
+    s3 = create_s3_client()
+    start = time.perf_counter()
     s3.download_file(bucket_name, s3_download_path, disk_download_path)
+    record_s3_transfer(
+        "download",
+        os.path.getsize(disk_download_path),
+        time.perf_counter() - start,
+    )
 
 
 def upload_video_to_s3(disk_upload_path, bucket_name, s3_upload_path):
-    s3 = boto3.client("s3")
+    s3 = create_s3_client()
+    start = time.perf_counter()
     s3.upload_file(disk_upload_path, bucket_name, s3_upload_path)
+    record_s3_transfer(
+        "upload", os.path.getsize(disk_upload_path), time.perf_counter() - start
+    )
 
 
 def get_s3_file(bucket_name, file_key, range_header=None):
     try:
-        s3 = boto3.client("s3")
+        s3 = get_shared_s3_client()
         if range_header:
             s3_response = s3.get_object(
                 Bucket=bucket_name, Key=file_key, Range=range_header
@@ -30,3 +80,28 @@ def get_s3_file(bucket_name, file_key, range_header=None):
     except botocore.exceptions.ClientError as e:
         print(f"Error fetching file from S3: {e}")
         return None, None, None, None
+
+
+def head_s3_file(bucket_name, file_key):
+    """ETag, size and type of an object, cached briefly to save a round trip per range request"""
+    cache_key = (bucket_name, file_key)
+    cached = _metadata_cache.get(cache_key)
+    if cached and time.monotonic() - cached[0] < METADATA_TTL_SECONDS:
+        return cached[1]
+
+    try:
+        s3_response = get_shared_s3_client().head_object(
+            Bucket=bucket_name, Key=file_key
+        )
+    except botocore.exceptions.ClientError as e:
+        logger.error(f"Error fetching file metadata from S3: {e}")
+        return None
+    metadata = {
+        "etag": s3_response["ETag"],
+        "content_length": s3_response["ContentLength"],
+        "content_type": s3_response.get("ContentType"),
+    }
+    if len(_metadata_cache) >= METADATA_CACHE_SIZE:
+        _metadata_cache.clear()
+    _metadata_cache[cache_key] = (time.monotonic(), metadata)
+    return metadata
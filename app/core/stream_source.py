@@ -0,0 +1,154 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def open_capture(source):
+    """cv2.VideoCapture of a camera index, file, named pipe or stream URL"""
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    return cv2.VideoCapture(source)
+
+
+class LatestFrameReader:
+    """Reads a live source on its own thread and keeps only the newest frame.
+
+    A consumer slower than the source never sees a backlog: frames it did
+    not pick up in time are overwritten and counted as dropped, so the
+    latency stays bounded by the processing time of a single frame. When a
+    read fails the source is reopened every retry_interval seconds, which
+    follows a growing file or a restarted stream, until no frame arrived for
+    idle_timeout seconds. A stalled pipe or socket can block cap.read() for
+    good; read() then gives up after idle_timeout and stop() does not wait
+    for the blocked thread.
+    """
+
+    def __init__(self, source, idle_timeout=5.0, retry_interval=0.5):
+        self.source = source
+        self.idle_timeout = idle_timeout
+        self.retry_interval = retry_interval
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.ended = False
+        self._last_frame_at = None
+        self._cap = None
+        self._latest = None  # (frame number, frame, captured at)
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._cap = open_capture(self.source)
+        if not self._cap.isOpened():
+            return False
+        self._last_frame_at = time.monotonic()
+        self._thread = threading.Thread(
+            target=self._read_loop, name="stream-reader", daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def read(self, timeout=None):
+        """Take the newest unread frame, None on timeout or once the source ended"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._latest is None and not self.ended:
+                now = time.monotonic()
+                idle_until = self._last_frame_at + self.idle_timeout
+                if now >= idle_until:
+                    # the reader thread never returns from a read on a stalled source
+                    logger.info(
+                        f"No frames from {self.source} for {self.idle_timeout}s, stopping"
+                    )
+                    self.ended = True
+                    break
+                if deadline is not None and now >= deadline:
+                    break
+                wait = idle_until - now
+                if deadline is not None:
+                    wait = min(wait, deadline - now)
+                self._condition.wait(wait)
+            latest, self._latest = self._latest, None
+            return latest
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is None:
+            if self._cap is not None:
+                self._cap.release()
+            return
+        # the reader thread releases the capture on its way out; one blocked in
+        # a read is a daemon thread, left to exit when the read returns
+        self._thread.join(timeout=self.idle_timeout)
+        if self._thread.is_alive():
+            logger.warning(f"Reader of {self.source} is blocked in a read, not waiting")
+
+    def stats(self):
+        return {
+            "frames_read": self.frames_read,
+            "frames_dropped": self.frames_dropped,
+        }
+
+    def _read_loop(self):
+        last_frame_at = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                ret, frame = self._cap.read()
+                if not ret:
+                    if time.monotonic() - last_frame_at > self.idle_timeout:
+                        logger.info(
+                            f"No frames from {self.source} for {self.idle_timeout}s, stopping"
+                        )
+                        return
+                    time.sleep(self.retry_interval)
+                    self._reopen()
+                    continue
+
+                last_frame_at = self._last_frame_at = time.monotonic()
+                with self._condition:
+                    if self._latest is not None:
+                        self.frames_dropped += 1
+                    self._latest = (self.frames_read, frame, time.perf_counter())
+                    self.frames_read += 1
+                    self._condition.notify()
+        finally:
+            self._cap.release()
+            with self._condition:
+                self.ended = True
+                self._condition.notify_all()
+
+    def _reopen(self):
+        self._cap.release()
+        self._cap = open_capture(self.source)
+        if isinstance(self.source, str) and os.path.isfile(self.source):
+            # a growing file: continue after the last frame that was read
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, self.frames_read)
+
+
+class LatencyStats:
+    """Percentiles over the most recent window of latency samples"""
+
+    def __init__(self, window=1000):
+        self._samples = deque(maxlen=window)
+
+    def add(self, seconds):
+        self._samples.append(seconds)
+
+    def percentiles(self):
+        """p50, p90, p99 and max latency in milliseconds"""
+        if not self._samples:
+            return None
+        samples = np.array(self._samples) * 1000
+        p50, p90, p99 = np.percentile(samples, [50, 90, 99])
+        return {
+            "p50": round(float(p50), 1),
+            "p90": round(float(p90), 1),
+            "p99": round(float(p99), 1),
+            "max": round(float(samples.max()), 1),
+        }
@@ -0,0 +1,129 @@
+import fcntl
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime
+
+
+class UploadSessionError(Exception):
+    status_code = 400
+
+
+class UploadNotFound(UploadSessionError):
+    status_code = 404
+
+
+class UploadOffsetMismatch(UploadSessionError):
+    status_code = 409
+
+    def __init__(self, message, offset):
+        super().__init__(message)
+        self.offset = offset
+
+
+class UploadChecksumMismatch(UploadSessionError):
+    status_code = 400
+
+
+class UploadTooLarge(UploadSessionError):
+    status_code = 413
+
+
+class UploadSessionStore:
+    """Resumable uploads written chunk by chunk straight into the video download directory.
+
+    The bytes received so far live in <upload_id>.mp4.part, so the current
+    offset is simply the size of that file and survives API restarts. Session
+    options are kept in a small JSON file next to it. Finalizing renames the
+    part file to <upload_id>.mp4, which is what start_inference expects.
+    """
+
+    def __init__(self, video_dir, chunk_size=1024 * 1024):
+        self.video_dir = video_dir
+        self.session_dir = os.path.join(video_dir, "uploads")
+        self.chunk_size = chunk_size
+
+    def create(self, total_size=None, options=None):
+        os.makedirs(self.session_dir, exist_ok=True)
+        upload_id = str(uuid.uuid4())
+        session = {
+            "upload_id": upload_id,
+            "total_size": total_size,
+            "options": options or {},
+            "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        with open(self._session_path(upload_id), "w") as f:
+            json.dump(session, f)
+        open(self._part_path(upload_id), "wb").close()
+        return self.status(upload_id)
+
+    def status(self, upload_id):
+        session = self._load(upload_id)
+        session["offset"] = os.path.getsize(self._part_path(upload_id))
+        return session
+
+    def write_chunk(self, upload_id, offset, stream, checksum=None):
+        """Append the chunk read from stream at offset and return the new offset.
+
+        Only a chunk at the current offset is accepted, bytes already received
+        are never rewritten; after a dropped connection the client asks for
+        the status and resumes from the offset it reports. The chunk is
+        rolled back if its SHA-256 does not match checksum or if it goes past
+        the total size declared for the upload.
+        """
+        total_size = self._load(upload_id)["total_size"]
+        with open(self._part_path(upload_id), "r+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            current_offset = os.fstat(f.fileno()).st_size
+            if offset != current_offset:
+                raise UploadOffsetMismatch(
+                    f"Expected a chunk at offset {current_offset}", current_offset
+                )
+
+            f.seek(offset)
+            digest = hashlib.sha256()
+            for chunk in iter(lambda: stream.read(self.chunk_size), b""):
+                if total_size is not None and f.tell() + len(chunk) > total_size:
+                    # finalize could never succeed with the extra bytes in the file
+                    f.truncate(offset)
+                    raise UploadTooLarge(
+                        f"Chunk goes past the upload size of {total_size} bytes"
+                    )
+                digest.update(chunk)
+                f.write(chunk)
+
+            if checksum and digest.hexdigest() != checksum.lower():
+                f.truncate(offset)
+                raise UploadChecksumMismatch("Chunk checksum mismatch")
+            return f.tell()
+
+    def finalize(self, upload_id):
+        """Check the upload is complete and move it to where start_inference picks it up"""
+        session = self.status(upload_id)
+        total_size = session["total_size"]
+        if total_size is not None and session["offset"] != total_size:
+            raise UploadOffsetMismatch(
+                f"Upload incomplete, {session['offset']} of {total_size} bytes received",
+                session["offset"],
+            )
+        os.rename(
+            self._part_path(upload_id),
+            os.path.join(self.video_dir, f"{upload_id}.mp4"),
+        )
+        os.remove(self._session_path(upload_id))
+        return session
+
+    def _load(self, upload_id):
+        try:
+            uuid.UUID(upload_id)
+            with open(self._session_path(upload_id)) as f:
+                return json.load(f)
+        except (ValueError, OSError):
+            raise UploadNotFound(f"Upload {upload_id} not found")
+
+    def _session_path(self, upload_id):
+        return os.path.join(self.session_dir, f"{upload_id}.json")
+
+    def _part_path(self, upload_id):
+        return os.path.join(self.video_dir, f"{upload_id}.mp4.part")
@@ -0,0 +1,198 @@
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+from fractions import Fraction
+import cv2
+
+logger = logging.getLogger(__name__)
+
+
+def frame_rate_arg(fps):
+    """Exact ffmpeg rate for a float fps, e.g. 29.97... -> 30000/1001"""
+    return str(Fraction(fps).limit_denominator(1001))
+
+
+class OpenCVVideoEncoder:
+    """Writes an mp4v temp file with cv2.VideoWriter and converts it to H.264 on finish"""
+
+    def __init__(self, temp_path, output_path, fps, frame_size, reencode):
+        self.temp_path = temp_path
+        self.output_path = output_path
+        self.reencode = reencode
+        self.writer = cv2.VideoWriter(
+            temp_path,
+            cv2.VideoWriter_fourcc(*"mp4v"),  # Try "mp4v", "XVID", "avc1", or "H264"
+            fps,
+            frame_size,
+        )
+
+    def is_opened(self):
+        return self.writer.isOpened()
+
+    def write(self, frame):
+        self.writer.write(frame)
+
+    def release(self):
+        self.writer.release()
+
+    def finish(self):
+        self.writer.release()
+        self.reencode(self.temp_path, self.output_path)
+
+    def abort(self):
+        self.writer.release()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+class FFmpegPipeEncoder:
+    """Streams raw BGR frames into a single libx264 ffmpeg process.
+
+    Audio is copied from the source video in the same pass, so there is no
+    intermediate file and no second decode / encode round trip.
+    """
+
+    def __init__(self, source_path, output_path, fps, frame_size):
+        width, height = frame_size
+        self.output_path = output_path
+        self._stderr = tempfile.TemporaryFile()
+        command = [
+            "ffmpeg",
+            "-y",  # Automatically overwrite output files
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "bgr24",
+            "-s",
+            f"{width}x{height}",
+            "-r",
+            frame_rate_arg(fps),  # a rounded rate would drift from the copied audio
+            "-i",
+            "pipe:0",
+            "-i",
+            source_path,
+            "-map",
+            "0:v:0",
+            "-map",
+            "1:a?",  # Copy the source audio when there is any
+            "-c:a",
+            "copy",
+            "-c:v",
+            "libx264",
+            "-pix_fmt",
+            "yuv420p",
+            "-vf",
+            "pad=ceil(iw/2)*2:ceil(ih/2)*2",  # yuv420p needs even dimensions
+            "-crf",
+            "23",
+            "-preset",
+            "fast",
+            "-shortest",  # end with the shorter of video and audio
+        ]
+        command.extend(self._output_args())
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE if self.output_path is None else None,
+            stderr=self._stderr,
+        )
+
+    def _output_args(self):
+        return ["-movflags", "+faststart", self.output_path]
+
+    def is_opened(self):
+        return self.process.poll() is None
+
+    def write(self, frame):
+        try:
+            self.process.stdin.write(frame.tobytes())
+        except BrokenPipeError:
+            self.process.wait()
+            raise RuntimeError(f"FFmpeg exited early: {self._read_stderr()}")
+
+    def release(self):
+        if not self.process.stdin.closed:
+            self.process.stdin.close()
+
+    def finish(self):
+        self.release()
+        returncode = self.process.wait()
+        if returncode != 0:
+            stderr = self._read_stderr()
+            logger.error(f"FFmpeg error: {stderr}")
+            self._remove_output()
+            raise subprocess.CalledProcessError(
+                returncode, self.process.args, stderr=stderr
+            )
+        self._stderr.close()
+        logger.info(f"Video encoded successfully")
+
+    def abort(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self._stderr.close()
+        self._remove_output()
+
+    def _read_stderr(self):
+        self._stderr.seek(0)
+        return self._stderr.read().decode(errors="replace")
+
+    def _remove_output(self):
+        if self.output_path and os.path.exists(self.output_path):
+            os.remove(self.output_path)
+
+
+class FFmpegStreamingEncoder(FFmpegPipeEncoder):
+    """Encodes fragmented MP4 to stdout and streams it into a sink while frames are still coming.
+
+    Fragmented MP4 needs no trailing index rewrite, so every finished
+    fragment can be uploaded right away, e.g. as S3 multipart parts.
+    """
+
+    def __init__(self, source_path, sink, fps, frame_size, chunk_size=1024 * 1024):
+        self.sink = sink
+        self.chunk_size = chunk_size
+        self._reader_error = None
+        super().__init__(source_path, None, fps, frame_size)
+        self._reader = threading.Thread(
+            target=self._copy_output, name="ffmpeg-output", daemon=True
+        )
+        self._reader.start()
+
+    def _output_args(self):
+        return [
+            "-movflags",
+            "frag_keyframe+empty_moov+default_base_moof",
+            "-f",
+            "mp4",
+            "pipe:1",
+        ]
+
+    def _copy_output(self):
+        try:
+            for chunk in iter(lambda: self.process.stdout.read(self.chunk_size), b""):
+                self.sink.write(chunk)
+        except Exception as e:
+            self._reader_error = e
+            # stop ffmpeg so the frame writer notices instead of blocking on a full pipe
+            self.process.kill()
+
+    def finish(self):
+        try:
+            self.release()
+            self._reader.join()
+            if self._reader_error is not None:
+                raise self._reader_error
+            super().finish()
+            self.sink.close()
+        except Exception:
+            self.sink.abort()
+            raise
+
+    def abort(self):
+        super().abort()
+        self._reader.join()
+        self.sink.abort()
@@ -0,0 +1,142 @@
+import glob
+import logging
+import os
+import subprocess
+from app.core.metrics import FFMPEG_SECONDS, timed
+
+logger = logging.getLogger(__name__)
+
+
+def probe_duration(input_path):
+    """Duration of the video in seconds"""
+    command = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-show_entries",
+        "format=duration",
+        "-of",
+        "default=noprint_wrappers=1:nokey=1",
+        input_path,
+    ]
+    result = subprocess.run(command, check=True, capture_output=True, text=True)
+    return float(result.stdout.strip() or 0)
+
+
+def count_frames(input_path):
+    """Number of video frames, counted from packets so nothing is decoded"""
+    command = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-count_packets",
+        "-show_entries",
+        "stream=nb_read_packets",
+        "-of",
+        "csv=p=0",
+        input_path,
+    ]
+    result = subprocess.run(command, check=True, capture_output=True, text=True)
+    return int(result.stdout.strip() or 0)
+
+
+def split_video(input_path, output_dir, segment_prefix, segment_seconds):
+    """Split a video into roughly segment_seconds long pieces without re-encoding.
+
+    With stream copy ffmpeg can only cut at keyframes, so every segment
+    starts on a keyframe and decodes on its own. Returns the segment paths
+    in order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    command = [
+        "ffmpeg",
+        "-y",  # Automatically overwrite output files
+        "-i",
+        input_path,
+        "-map",
+        "0",
+        "-c",
+        "copy",
+        "-f",
+        "segment",
+        "-segment_time",
+        str(segment_seconds),
+        "-reset_timestamps",
+        "1",
+        f"{output_dir}/{segment_prefix}%03d.mp4",
+    ]
+    try:
+        with timed(FFMPEG_SECONDS, operation="split"):
+            subprocess.run(command, check=True, capture_output=True, text=True)
+    except subprocess.CalledProcessError as e:
+        logger.error(f"FFmpeg error: {e.stderr}")
+        raise
+    return sorted(glob.glob(f"{output_dir}/{segment_prefix}[0-9][0-9][0-9].mp4"))
+
+
+def concat_videos(input_paths, output_path):
+    """Join videos with identical codec settings without re-encoding"""
+    list_path = f"{output_path}.txt"
+    with open(list_path, "w") as f:
+        for input_path in input_paths:
+            f.write(f"file '{os.path.abspath(input_path)}'\n")
+
+    command = [
+        "ffmpeg",
+        "-y",  # Automatically overwrite output files
+        "-f",
+        "concat",
+        "-safe",
+        "0",
+        "-i",
+        list_path,
+        "-c",
+        "copy",
+        "-movflags",
+        "+faststart",
+        output_path,
+    ]
+    try:
+        with timed(FFMPEG_SECONDS, operation="concat"):
+            subprocess.run(command, check=True, capture_output=True, text=True)
+    except subprocess.CalledProcessError as e:
+        logger.error(f"FFmpeg error: {e.stderr}")
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    finally:
+        os.remove(list_path)
+
+
+def merge_segment_results(segment_results, frame_offsets):
+    """Combine per-segment detections into one result with global frame numbers and track ids"""
+    plate_numbers_with_info = []
+    plate_tracks = []
+    track_offset = 0
+    for result, frame_offset in zip(segment_results, frame_offsets):
+        max_track_id = 0
+        for detection in result["plate_numbers_with_info"]:
+            detection = dict(detection, frame_number=detection["frame_number"] + frame_offset)
+            if "track_id" in detection:
+                max_track_id = max(max_track_id, detection["track_id"])
+                detection["track_id"] += track_offset
+            plate_numbers_with_info.append(detection)
+
+        for track in result.get("plate_tracks", []):
+            max_track_id = max(max_track_id, track["track_id"])
+            plate_tracks.append(
+                dict(
+                    track,
+                    track_id=track["track_id"] + track_offset,
+                    first_frame=track["first_frame"] + frame_offset,
+                    last_frame=track["last_frame"] + frame_offset,
+                )
+            )
+        track_offset += max_track_id
+
+    merged = {"plate_numbers_with_info": plate_numbers_with_info}
+    if plate_tracks:
+        merged["plate_tracks"] = plate_tracks
+    return merged
@@ -1,63 +1,310 @@
+import logging
 import os
-import json
+import time
+from collections import deque
 from celery import Celery
-from celery import states
+from celery import chord, group
 from celery.signals import (
+    before_task_publish,
     task_success,
     task_failure,
     task_prerun,
+    task_postrun,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
 )
-from app.models.models import UserModel, JobsModel, InferenceModel
-from app.constants import JobConstants as job_constants
+from app.models.models import engine, remove_session
+from app.jobs import job_state
 from app.constants import AppConstants as app_constants
+from app.constants import OutputModes
+from app.core import metrics
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Configure Celery to use the Redis broker
 broker_url = os.getenv("RABBITMQ_URI")
 
-worker = Celery("inference_worker", broker=broker_url)
+# Segmented inference runs as a chord, which needs a result backend
+backend_url = os.getenv("CELERY_RESULT_BACKEND")
+
+worker = Celery("inference_worker", broker=broker_url, backend=backend_url)
+
+# prefork children load and warm the models in worker_process_init before they
+# report up; the default 4s alive timeout would kill them mid load
+worker.conf.worker_proc_alive_timeout = app_constants.WORKER_PROC_ALIVE_TIMEOUT
+
+# custom task state published while a video is being processed
+PROGRESS = "PROGRESS"
+QUEUED = "QUEUED"
+
+
+@worker_init.connect
+def init_worker(*args, **kwargs):
+    # with the prefork pool set PROMETHEUS_MULTIPROC_DIR, so this server in the
+    # main process also exposes the metrics recorded by the child processes
+    if app_constants.WORKER_METRICS_PORT:
+        metrics.start_metrics_server(app_constants.WORKER_METRICS_PORT)
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(pid=None, *args, **kwargs):
+    metrics.mark_process_dead(pid or os.getpid())
+
+
+@worker_process_init.connect
+def init_worker_process(*args, **kwargs):
+    # pooled connections inherited from the parent must not be shared after fork
+    engine.dispose(close=False)
+
+    # load and warm the models once per worker process instead of once per task
+    from app.core.model_registry import model_registry
+
+    model_registry.get_inference_manager()
 
 
 @worker.task(bind=True)
-def start_inference(self, temp_uuid) -> tuple:
-    from app.core.InferenceManager import InferenceManager
-    inference_manager = InferenceManager()
+def start_inference(self, temp_uuid, options=None) -> tuple:
+    from app.core.model_registry import model_registry
+
     task_id = self.request.id
     temp_file_path = f"{app_constants.VIDEO_DOWNLOAD_TEMP_DIR}/{temp_uuid}.mp4"
     new_file_path = f"{app_constants.VIDEO_DOWNLOAD_TEMP_DIR}/{task_id}.mp4"
     os.rename(temp_file_path, new_file_path)
-    return inference_manager.detect_car_plates_yolov8(task_id)
+    options = options or {}
+    output_mode = options.get("output_mode", OutputModes.VIDEO)
 
+    if _should_segment(new_file_path, output_mode, options.get("profile", False)):
+        # the chord callback inherits this task id, so it completes the same job
+        return self.replace(_segmented_inference(task_id, new_file_path, output_mode))
 
-@task_prerun.connect
-def task_prerun_handler(task_id, task, *args, **kwargs):
-    # mock session user
-    user_uuid = UserModel.get_user_uuid_by_email("dummyUser@dummy.com")
-    model_uuid = InferenceModel.save_inference_to_db(
-        inference_uuid=task_id,
-        user_uuid=user_uuid,
-        inference_status=states.STARTED,
-        inference_output=None,
+    inference_manager = model_registry.get_inference_manager()
+    if not options.get("profile"):
+        return inference_manager.detect_car_plates_yolov8(
+            task_id,
+            output_mode=output_mode,
+            progress_callback=_progress_publisher(self, task_id),
+        )
+
+    from app.core.profiling import profiled
+
+    profile_path = f"{app_constants.PROFILE_DIR}/{task_id}.prof"
+    try:
+        with profiled(profile_path):
+            # cProfile only sees this thread, so the stages run sequentially in it
+            return inference_manager.detect_car_plates_yolov8(
+                task_id,
+                output_mode=output_mode,
+                progress_callback=_progress_publisher(self, task_id),
+                pipeline_enabled=False,
+            )
+    finally:
+        job_state.set_profile_path(task_id, _store_profile(task_id, profile_path))
+
+
+@worker.task(bind=True)
+def process_segment(self, inference_uuid, segment_uuid, output_mode) -> dict:
+    from app.core.model_registry import model_registry
+
+    inference_manager = model_registry.get_inference_manager()
+    # progress goes to the inference uuid, the one the progress stream watches
+    publish = _progress_publisher(self, inference_uuid)
+    return inference_manager.detect_car_plates_yolov8(
+        segment_uuid,
+        output_mode=output_mode,
+        upload_output=False,
+        progress_callback=(
+            (lambda progress: publish({**progress, "segment": segment_uuid}))
+            if publish is not None
+            else None
+        ),
     )
-    JobsModel.save_job_to_db(
-        job_uuid=task_id,
-        user_uuid=user_uuid,
-        job_type=job_constants.START_INFERENCE,
-        job_status=states.STARTED,
-        reference_uuid=model_uuid,
+
+
+@worker.task(bind=True)
+def merge_segments(
+    self, segment_results, inference_uuid, frame_offsets, output_mode
+) -> dict:
+    from app.core.s3_utils import upload_video_to_s3
+    from app.core.video_segments import concat_videos, merge_segment_results
+
+    response = merge_segment_results(segment_results, frame_offsets)
+    response["output_video_path"] = None
+    if output_mode == OutputModes.VIDEO:
+        bucket_name = os.getenv("BUCKET_NAME")
+        output_video_key = f"mesos/{inference_uuid}.mp4"
+        output_video_path = f"{app_constants.VIDEO_UPLOAD_TEMP_DIR}/{inference_uuid}.mp4"
+        segment_paths = [result["output_video_path"] for result in segment_results]
+        concat_videos(segment_paths, output_video_path)
+        upload_video_to_s3(output_video_path, bucket_name, output_video_key)
+        for path in segment_paths + [output_video_path]:
+            os.remove(path)
+        response["output_video_path"] = f"s3://{bucket_name}/{output_video_key}"
+    return response
+
+
+@worker.task(bind=True)
+def stream_inference(self, source, max_seconds=None) -> dict:
+    """Detect plates on a live source, publishing the latest readings as progress"""
+    from app.core.model_registry import model_registry
+
+    publish = _progress_publisher(self, self.request.id)
+    recent_readings = deque(maxlen=app_constants.STREAM_RECENT_DETECTIONS)
+    readings_count = 0
+
+    def on_readings(frame_number, readings):
+        nonlocal readings_count
+        readings_count += len(readings)
+        recent_readings.extend(readings)
+        if publish is not None:
+            publish(
+                {
+                    "frame_number": frame_number,
+                    "readings": readings_count,
+                    "recent_readings": list(recent_readings),
+                }
+            )
+
+    inference_manager = model_registry.get_inference_manager()
+    return inference_manager.process_stream(
+        source, on_readings, max_seconds=max_seconds
     )
 
 
+def _progress_publisher(task, task_id):
+    """Callback storing progress as the PROGRESS state of the task in the result backend"""
+    if not backend_url:
+        return None
+
+    def publish(progress):
+        # task_id is explicit: progress is reported from pipeline threads,
+        # which don't see the task's thread-local request
+        try:
+            task.update_state(task_id=task_id, state=PROGRESS, meta=progress)
+        except Exception as e:
+            # progress is best effort and must never fail the inference
+            logger.warning(f"Could not publish progress of {task_id}: {e}")
+
+    return publish
+
+
+def _store_profile(task_id, profile_path):
+    """Upload the profile next to the output video and return where it is kept"""
+    from app.core.s3_utils import upload_video_to_s3
+
+    bucket_name = os.getenv("BUCKET_NAME")
+    if not bucket_name:
+        return profile_path
+    profile_key = f"mesos/{task_id}.prof"
+    try:
+        upload_video_to_s3(profile_path, bucket_name, profile_key)
+    except Exception as e:
+        logger.error(f"Could not upload profile of {task_id}: {e}")
+        return profile_path
+    os.remove(profile_path)
+    return f"s3://{bucket_name}/{profile_key}"
+
+
+def _should_segment(input_path, output_mode, profile=False):
+    from app.core.video_segments import probe_duration
+
+    # a profiled job runs in one process so a single profile covers all of it
+    if (
+        app_constants.SEGMENT_SECONDS <= 0
+        or output_mode == OutputModes.OVERLAY
+        or profile
+    ):
+        return False
+    if not worker.conf.result_backend:
+        # the chord callback needs the segment results from a result backend
+        logger.warning(
+            "SEGMENT_SECONDS is set but CELERY_RESULT_BACKEND is not, "
+            "processing the video in one task"
+        )
+        return False
+    return probe_duration(input_path) > 2 * app_constants.SEGMENT_SECONDS
+
+
+def _segmented_inference(inference_uuid, input_path, output_mode):
+    """Split the video at keyframes and fan the segments out as a chord"""
+    from app.core.video_segments import count_frames, split_video
+
+    segment_paths = split_video(
+        input_path,
+        app_constants.VIDEO_DOWNLOAD_TEMP_DIR,
+        f"{inference_uuid}_segment_",
+        app_constants.SEGMENT_SECONDS,
+    )
+    frame_offsets = []
+    frame_offset = 0
+    for segment_path in segment_paths:
+        frame_offsets.append(frame_offset)
+        frame_offset += count_frames(segment_path)
+
+    segment_uuids = [
+        os.path.splitext(os.path.basename(segment_path))[0]
+        for segment_path in segment_paths
+    ]
+    return chord(
+        group(
+            process_segment.s(inference_uuid, segment_uuid, output_mode)
+            for segment_uuid in segment_uuids
+        ),
+        merge_segments.s(inference_uuid, frame_offsets, output_mode),
+    )
+
+
+@before_task_publish.connect
+def before_task_publish_handler(sender=None, headers=None, *args, **kwargs):
+    if headers is None:
+        return
+    # custom headers show up on the task request, used for the queue wait time
+    headers["published_at"] = time.time()
+    if sender == start_inference.name and worker.conf.result_backend:
+        # the backend reports PENDING for unknown uuids too, this tells a queued job apart
+        worker.backend.store_result(headers["id"], None, QUEUED)
+
+
+@task_prerun.connect
+def task_prerun_handler(task_id, task, *args, **kwargs):
+    published_at = getattr(task.request, "published_at", None)
+    if published_at is not None:
+        metrics.QUEUE_WAIT_SECONDS.labels(task=task.name).observe(
+            max(0.0, time.time() - published_at)
+        )
+
+    # segment tasks and the merge callback belong to the start_inference job
+    if task.name != start_inference.name:
+        return
+
+    task_args = kwargs.get("args") or []
+    options = (task_args[1] if len(task_args) > 1 else None) or {}
+
+    # inference and job rows are inserted together, the mock session user is cached
+    job_state.start_job(task_id, options)
+
+
 @task_success.connect
 def task_success_handler(sender=None, result=None, *args, **kwargs):
-    task_id = sender.request.id
-    InferenceModel.update_inference_status(task_id, states.SUCCESS)
-    InferenceModel.update_inference_output(task_id, json.dumps(result))
-    JobsModel.update_task_status(task_id, states.SUCCESS)
+    if sender.name not in (start_inference.name, merge_segments.name):
+        return
+
+    job_state.complete_job(sender.request.id, result)
+
+
+@task_postrun.connect
+def task_postrun_handler(*args, **kwargs):
+    # return the task's DB session to the pool once all handlers ran
+    remove_session()
 
 
 @task_failure.connect
 def task_failure_handler(task_id, *args, **kwargs):
-    JobsModel.update_task_status(task_id, states.FAILURE)
+    sender = kwargs.get("sender")
+    if sender is not None and sender.name == process_segment.name:
+        # a failed segment fails the logical inference it belongs to
+        task_id = kwargs["args"][0]
+    job_state.fail_job(task_id)
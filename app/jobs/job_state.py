@@ -0,0 +1,98 @@
+import json
+import logging
+from celery import states
+from app.models.models import UserModel, JobsModel, InferenceModel, DetectionModel
+from app.models.models import session, session_scope
+from app.constants import JobConstants as job_constants
+
+logger = logging.getLogger(__name__)
+
+DUMMY_USER_EMAIL = "dummyUser@dummy.com"
+
+_user_uuid_cache = {}
+
+
+def get_user_uuid(email=DUMMY_USER_EMAIL):
+    """User uuid by email, looked up once per process"""
+    if email not in _user_uuid_cache:
+        user_uuid = UserModel.get_user_uuid_by_email(email)
+        if user_uuid is None:
+            # not created yet, look it up again next time
+            return None
+        _user_uuid_cache[email] = user_uuid
+    return _user_uuid_cache[email]
+
+
+def start_job(job_uuid, options=None):
+    """Insert the inference and its job row in a single transaction"""
+    options = options or {}
+    user_uuid = get_user_uuid()
+    with session_scope():
+        session.add(
+            InferenceModel(
+                inference_uuid=job_uuid,
+                user_uuid=user_uuid,
+                inference_status=states.STARTED,
+                inference_output=None,
+                video_sha256=options.get("video_sha256"),
+                model_version=options.get("model_version"),
+                inference_settings=options.get("inference_settings"),
+            )
+        )
+        session.add(
+            JobsModel(
+                job_uuid=job_uuid,
+                user_uuid=user_uuid,
+                job_type=job_constants.START_INFERENCE,
+                job_status=states.STARTED,
+                reference_uuid=job_uuid,
+            )
+        )
+
+
+def complete_job(job_uuid, inference_output):
+    """Store the output and its detections and mark the inference and its job
+    successful in one transaction"""
+    detections = DetectionModel.to_rows(
+        job_uuid, (inference_output or {}).get("plate_numbers_with_info", [])
+    )
+    _transition(
+        job_uuid,
+        states.SUCCESS,
+        {InferenceModel.inference_output: json.dumps(inference_output)},
+        detections,
+    )
+
+
+def fail_job(job_uuid):
+    """Mark the inference and its job failed in one transaction"""
+    _transition(job_uuid, states.FAILURE)
+
+
+def set_profile_path(job_uuid, profile_path):
+    with session_scope():
+        session.query(InferenceModel).filter_by(inference_uuid=job_uuid).update(
+            {InferenceModel.profile_path: profile_path}, synchronize_session=False
+        )
+
+
+def _transition(job_uuid, status, inference_values=None, detections=None):
+    # bulk UPDATEs skip loading the rows; all statements commit or roll back together
+    values = {InferenceModel.inference_status: status}
+    values.update(inference_values or {})
+    with session_scope():
+        if detections:
+            # a single executemany instead of one INSERT per detection
+            session.bulk_insert_mappings(DetectionModel, detections)
+        updated = (
+            session.query(InferenceModel)
+            .filter_by(inference_uuid=job_uuid)
+            .update(values, synchronize_session=False)
+        )
+        updated += (
+            session.query(JobsModel)
+            .filter_by(job_uuid=job_uuid)
+            .update({JobsModel.job_status: status}, synchronize_session=False)
+        )
+    if updated != 2:
+        logger.warning(f"Job {job_uuid} transition to {status} updated {updated} of 2 rows")
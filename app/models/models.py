@@ -1,17 +1,47 @@
+import logging
 import uuid, os
+from contextlib import contextmanager
 from datetime import datetime
 from celery import states
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import Column, String, DateTime, ForeignKey, JSON
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker, scoped_session, declarative_base
+from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Index
+from sqlalchemy import Integer, Float
+from sqlalchemy import and_, or_, func, text
+from sqlalchemy.exc import DBAPIError
 
+logger = logging.getLogger(__name__)
 
-engine = create_engine(os.getenv("DATABASE_URI"))
+engine = create_engine(
+    os.getenv("DATABASE_URI"),
+    pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", "30")),
+    pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    pool_pre_ping=True,  # transparently replace connections dropped by the server
+)
 
 Base = declarative_base()
 
-session = sessionmaker(bind=engine)()
+# one session per thread, so Flask request threads and Celery tasks never share one;
+# call remove_session() when the request or task is done
+session = scoped_session(sessionmaker(bind=engine))
+
+
+@contextmanager
+def session_scope():
+    """Commit the thread's session on success, roll it back on any error"""
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+
+def remove_session(*args, **kwargs):
+    session.remove()
 
 
 class UserModel(Base):
@@ -43,8 +73,8 @@ class UserModel(Base):
         model = UserModel(
             username=dummy_username, email=dummy_email, password=dummy_pwd
         )
-        session.add(model)
-        session.commit()
+        with session_scope():
+            session.add(model)
         return model.user_uuid
 
     @staticmethod
@@ -62,13 +92,27 @@ class UserModel(Base):
 
 class InferenceModel(Base):
     __tablename__ = "inference_model"
+    __table_args__ = (
+        # backs the status filtered, newest first history and latest completed lookups
+        Index(
+            "ix_inference_status_datetime",
+            "inference_status",
+            "inference_datetime",
+            "inference_uuid",
+        ),
+        Index("ix_inference_datetime_uuid", "inference_datetime", "inference_uuid"),
+    )
     inference_uuid = Column(
         String(36), primary_key=True, default=lambda: str(uuid.uuid4())
     )
     user_uuid = Column(String(36), ForeignKey("user_model.user_uuid"), nullable=False)
-    inference_datetime = Column(DateTime, nullable=False, default=datetime.now())
+    inference_datetime = Column(DateTime, nullable=False, default=datetime.now)
     inference_status = Column(String(80), nullable=False)
     inference_output = Column(JSON, nullable=True)
+    video_sha256 = Column(String(64), nullable=True, index=True)
+    model_version = Column(String(64), nullable=True)
+    inference_settings = Column(String(64), nullable=True)
+    profile_path = Column(String(255), nullable=True)
 
     def __init__(
         self,
@@ -76,11 +120,17 @@ class InferenceModel(Base):
         user_uuid,
         inference_status,
         inference_output=None,
+        video_sha256=None,
+        model_version=None,
+        inference_settings=None,
     ):
         self.inference_uuid = inference_uuid
         self.user_uuid = user_uuid
         self.inference_status = inference_status
         self.inference_output = inference_output
+        self.video_sha256 = video_sha256
+        self.model_version = model_version
+        self.inference_settings = inference_settings
 
     @staticmethod
     def save_inference_to_db(
@@ -88,15 +138,21 @@ class InferenceModel(Base):
         user_uuid,
         inference_status,
         inference_output=None,
+        video_sha256=None,
+        model_version=None,
+        inference_settings=None,
     ):
         inference = InferenceModel(
             inference_uuid=inference_uuid,
             user_uuid=user_uuid,
             inference_status=inference_status,
             inference_output=inference_output,
+            video_sha256=video_sha256,
+            model_version=model_version,
+            inference_settings=inference_settings,
         )
-        session.add(inference)
-        session.commit()
+        with session_scope():
+            session.add(inference)
         return inference.inference_uuid
 
     @staticmethod
@@ -117,42 +173,90 @@ class InferenceModel(Base):
         )
     
     @staticmethod
-    def get_all_inference_job():
+    def get_completed_duplicate(video_sha256, model_version, inference_settings):
+        """Latest completed inference of the same video, model and settings"""
         return (
             session.query(InferenceModel)
+            .filter_by(
+                video_sha256=video_sha256,
+                model_version=model_version,
+                inference_settings=inference_settings,
+                inference_status=states.SUCCESS,
+            )
             .order_by(InferenceModel.inference_datetime.desc())
+            .first()
         )
 
     @staticmethod
-    def update_inference_status(inference_uuid, inference_status):
-        record = (
-            session.query(InferenceModel)
-            .filter_by(inference_uuid=inference_uuid)
-            .first()
+    def get_inference_page(
+        limit, after=None, inference_status=None, start_datetime=None, end_datetime=None
+    ):
+        """Newest first page of (uuid, status, datetime) rows after the (datetime, uuid) keyset"""
+        query = session.query(
+            InferenceModel.inference_uuid,
+            InferenceModel.inference_status,
+            InferenceModel.inference_datetime,
         )
-        record.inference_status = inference_status
-        session.commit()
+        if inference_status:
+            query = query.filter(InferenceModel.inference_status == inference_status)
+        if start_datetime:
+            query = query.filter(InferenceModel.inference_datetime >= start_datetime)
+        if end_datetime:
+            query = query.filter(InferenceModel.inference_datetime < end_datetime)
+        if after:
+            after_datetime, after_uuid = after
+            query = query.filter(
+                or_(
+                    InferenceModel.inference_datetime < after_datetime,
+                    and_(
+                        InferenceModel.inference_datetime == after_datetime,
+                        InferenceModel.inference_uuid < after_uuid,
+                    ),
+                )
+            )
+        return (
+            query.order_by(
+                InferenceModel.inference_datetime.desc(),
+                InferenceModel.inference_uuid.desc(),
+            )
+            .limit(limit)
+            .all()
+        )
+
+    @staticmethod
+    def update_inference_status(inference_uuid, inference_status):
+        with session_scope():
+            record = (
+                session.query(InferenceModel)
+                .filter_by(inference_uuid=inference_uuid)
+                .first()
+            )
+            record.inference_status = inference_status
         return record.inference_uuid
 
+    @staticmethod
     def update_inference_output(inference_uuid, inference_output):
-        record = (
-            session.query(InferenceModel)
-            .filter_by(inference_uuid=inference_uuid)
-            .first()
-        )
-        record.inference_output = inference_output
-        session.commit()
+        with session_scope():
+            record = (
+                session.query(InferenceModel)
+                .filter_by(inference_uuid=inference_uuid)
+                .first()
+            )
+            record.inference_output = inference_output
         return record.inference_uuid
 
     @staticmethod
     def delete_record_by_uuid(inference_uuid):
-        record = (
-            session.query(InferenceModel)
-            .filter_by(inference_uuid=inference_uuid)
-            .first()
-        )
-        session.delete(record)
-        session.commit()
+        with session_scope():
+            record = (
+                session.query(InferenceModel)
+                .filter_by(inference_uuid=inference_uuid)
+                .first()
+            )
+            session.query(DetectionModel).filter_by(
+                inference_uuid=inference_uuid
+            ).delete(synchronize_session=False)
+            session.delete(record)
         return record.inference_uuid
 
     def __repr__(self):
@@ -164,7 +268,7 @@ class JobsModel(Base):
     job_uuid = Column(String(36), primary_key=True)
     user_uuid = Column(String(36), ForeignKey("user_model.user_uuid"), nullable=False)
     job_type = Column(String(80), nullable=False)
-    job_datetime = Column(DateTime, nullable=False, default=datetime.now())
+    job_datetime = Column(DateTime, nullable=False, default=datetime.now)
     job_status = Column(String(80), nullable=False)
     reference_uuid = Column(String(36), nullable=True)
 
@@ -184,8 +288,8 @@ class JobsModel(Base):
             job_status=job_status,
             reference_uuid=reference_uuid,
         )
-        session.add(job)
-        session.commit()
+        with session_scope():
+            session.add(job)
         return job.job_uuid
 
     @staticmethod
@@ -194,21 +298,178 @@ class JobsModel(Base):
 
     @staticmethod
     def update_task_status(job_uuid, job_status):
-        record = session.query(JobsModel).filter_by(job_uuid=job_uuid).first()
-        record.job_status = job_status
-        session.commit()
+        with session_scope():
+            record = session.query(JobsModel).filter_by(job_uuid=job_uuid).first()
+            record.job_status = job_status
         return record.job_uuid
 
     @staticmethod
     def update_task_reference(job_uuid, reference_uuid):
-        record = session.query(JobsModel).filter_by(job_uuid=job_uuid).first()
-        record.reference_uuid = reference_uuid
-        session.commit()
+        with session_scope():
+            record = session.query(JobsModel).filter_by(job_uuid=job_uuid).first()
+            record.reference_uuid = reference_uuid
         return record.job_uuid
 
     def __repr__(self):
         return f"<JobsModel {self.job_uuid}>"
 
 
+class DetectionModel(Base):
+    __tablename__ = "detection_model"
+    __table_args__ = (
+        # backs the plate search, which returns matches grouped by inference and frame
+        Index(
+            "ix_detection_plate_inference_frame",
+            "plate_number",
+            "inference_uuid",
+            "frame_number",
+        ),
+    )
+    detection_id = Column(Integer, primary_key=True, autoincrement=True)
+    inference_uuid = Column(
+        String(36),
+        ForeignKey("inference_model.inference_uuid"),
+        nullable=False,
+        index=True,
+    )
+    frame_number = Column(Integer, nullable=False)
+    x = Column(Integer, nullable=False)
+    y = Column(Integer, nullable=False)
+    w = Column(Integer, nullable=False)
+    h = Column(Integer, nullable=False)
+    plate_number = Column(String(32), nullable=False)
+    confidence = Column(Float, nullable=False)
+    track_id = Column(Integer, nullable=True)
+
+    @staticmethod
+    def to_rows(inference_uuid, plate_numbers_with_info):
+        """Insert mappings for the detections of an inference result"""
+        rows = []
+        for detection in plate_numbers_with_info:
+            x, y, w, h = (int(value) for value in detection["bounding_box"])
+            track_id = detection.get("track_id")
+            rows.append(
+                {
+                    "inference_uuid": inference_uuid,
+                    "frame_number": int(detection["frame_number"]),
+                    "x": x,
+                    "y": y,
+                    "w": w,
+                    "h": h,
+                    "plate_number": str(detection["plate_number"]),
+                    "confidence": float(detection["confidence"]),
+                    "track_id": int(track_id) if track_id is not None else None,
+                }
+            )
+        return rows
+
+    @staticmethod
+    def get_plates_after(after_id):
+        """(highest detection id, distinct plate numbers of the detections after after_id)"""
+        high_water_mark = session.query(func.max(DetectionModel.detection_id)).scalar()
+        if high_water_mark is None or high_water_mark <= after_id:
+            return after_id, []
+        rows = (
+            session.query(DetectionModel.plate_number)
+            .filter(
+                DetectionModel.detection_id > after_id,
+                DetectionModel.detection_id <= high_water_mark,
+            )
+            .distinct()
+            .all()
+        )
+        return high_water_mark, [row.plate_number for row in rows]
+
+    @staticmethod
+    def search_by_plates(plate_numbers, limit):
+        """Detections of any of plate_numbers in completed inferences, ordered by inference and frame"""
+        return (
+            session.query(DetectionModel)
+            .join(
+                InferenceModel,
+                InferenceModel.inference_uuid == DetectionModel.inference_uuid,
+            )
+            .filter(
+                DetectionModel.plate_number.in_(plate_numbers),
+                InferenceModel.inference_status == states.SUCCESS,
+            )
+            .order_by(DetectionModel.inference_uuid, DetectionModel.frame_number)
+            .limit(limit)
+            .all()
+        )
+
+    def to_dict(self):
+        return {
+            "inference_uuid": self.inference_uuid,
+            "frame_number": self.frame_number,
+            "bounding_box": [self.x, self.y, self.w, self.h],
+            "plate_number": self.plate_number,
+            "confidence": self.confidence,
+            "track_id": self.track_id,
+        }
+
+    def __repr__(self):
+        return f"<DetectionModel {self.detection_id}>"
+
+
+def _column_names(table):
+    return {column["name"] for column in inspect(engine).get_columns(table.name)}
+
+
+def add_missing_columns(table):
+    """Migrate a table created by an older release: create_all only creates
+    missing tables, this adds the columns added to the model since then"""
+    columns = _column_names(table)
+    for column in table.columns:
+        if column.name in columns:
+            continue
+        if not column.nullable and column.server_default is None:
+            raise RuntimeError(
+                f"{table.name}.{column.name} is NOT NULL without a default, "
+                f"add it with a manual migration"
+            )
+        column_type = column.type.compile(dialect=engine.dialect)
+        try:
+            with engine.begin() as connection:
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {table.name} "
+                        f"ADD COLUMN {column.name} {column_type}"
+                    )
+                )
+        except DBAPIError:
+            # the API and the worker start together, the other one may have won
+            if column.name not in _column_names(table):
+                raise
+        logger.info(f"Added column {table.name}.{column.name}")
+
+
+def create_missing_indexes(table):
+    """create_all skips indexes of tables that already exist; add the ones
+    whose columns the table has, an index on a column that is not there yet
+    would fail the import of this module"""
+    columns = _column_names(table)
+    for index in table.indexes:
+        missing = [
+            column.name for column in index.columns if column.name not in columns
+        ]
+        if missing:
+            logger.warning(
+                f"Not creating index {index.name}, {table.name} has no column "
+                f"{', '.join(missing)}"
+            )
+            continue
+        try:
+            index.create(engine, checkfirst=True)
+        except DBAPIError:
+            indexes = inspect(engine).get_indexes(table.name)
+            if index.name not in {existing["name"] for existing in indexes}:
+                raise
+
+
 # drop all tables and recreate them
 Base.metadata.create_all(engine)
+
+for table in Base.metadata.sorted_tables:
+    add_missing_columns(table)
+    create_missing_indexes(table)
@@ -38,18 +38,29 @@ const createInferenceItem = (inference) => {
   `;
 };
 
-const renderInferenceList = (data) => {
+const renderInferenceList = (data, append = false) => {
   const videoList = document.getElementById("videoList");
-  videoList.innerHTML = data.inference_results
-    .map(createInferenceItem)
-    .join("");
-  addClickEventListeners();
+  const items = data.inference_results.map(createInferenceItem).join("");
+  const renderedCount = append
+    ? videoList.getElementsByClassName("list-group-item").length
+    : 0;
+  if (append) {
+    videoList.insertAdjacentHTML("beforeend", items);
+  } else {
+    videoList.innerHTML = items;
+  }
+  addClickEventListeners(renderedCount);
+
+  nextInferenceCursor = data.next_cursor;
+  document
+    .getElementById("loadMoreVideos")
+    .classList.toggle("d-none", !nextInferenceCursor);
 };
 
-const addClickEventListeners = () => {
+const addClickEventListeners = (fromIndex = 0) => {
   const videoList = document.getElementById("videoList");
   const listItems = videoList.getElementsByClassName("list-group-item");
-  Array.from(listItems).forEach((li) => {
+  Array.from(listItems).slice(fromIndex).forEach((li) => {
     li.addEventListener("click", () => {
       const uuid = li.getAttribute("data-uuid");
       updateVideoSource(uuid);
@@ -81,16 +92,33 @@ function deleteVideo(uuid) {
     .catch((error) => console.error("Error deleting video:", error));
 }
 
-const initVideoList = () => {
-  fetch(`${host}/v1/api/inference/all`)
+// next_cursor of the last page shown, the next page is only fetched on "Load more"
+let nextInferenceCursor = null;
+
+const fetchInferencePage = (cursor) => {
+  const query = cursor ? `&cursor=${encodeURIComponent(cursor)}` : "";
+  return fetch(`${host}/v1/api/inference/all?limit=50${query}`)
     .then((response) => response.json())
     .then((data) => {
-      if (data && data.inference_results) {
-        renderInferenceList(data);
-      } else {
-        console.error("Invalid response structure:", data);
+      if (!data || !data.inference_results) {
+        throw new Error(`Invalid response structure: ${JSON.stringify(data)}`);
       }
-    })
+      return data;
+    });
+};
+
+const initVideoList = () => {
+  fetchInferencePage()
+    .then((data) => renderInferenceList(data))
+    .catch((error) => console.error("Error fetching inference jobs:", error));
+};
+
+const loadMoreVideos = () => {
+  if (!nextInferenceCursor) {
+    return;
+  }
+  fetchInferencePage(nextInferenceCursor)
+    .then((data) => renderInferenceList(data, true))
     .catch((error) => console.error("Error fetching inference jobs:", error));
 };
 
@@ -131,6 +159,9 @@ const generateAlert = () => {
 };
 
 document.addEventListener("DOMContentLoaded", () => {
+  document
+    .getElementById("loadMoreVideos")
+    .addEventListener("click", loadMoreVideos);
   initVideoList();
   initVideo();
   generateAlert();
@@ -0,0 +1,67 @@
+"""Compare two benchmark results files stage by stage.
+
+    python -m benchmarks.compare benchmarks/results/latest.json benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import sys
+
+
+def compare_results(results, baseline, tolerance=0.15):
+    """One row per case and stage timed in both files; a regression is a stage
+    that got slower than the baseline by more than tolerance"""
+    baseline_cases = {case["name"]: case for case in baseline["cases"]}
+    rows = []
+    for case in results["cases"]:
+        baseline_case = baseline_cases.get(case["name"])
+        if baseline_case is None:
+            continue
+        for stage, timing in case["stages"].items():
+            baseline_timing = baseline_case["stages"].get(stage)
+            if not baseline_timing or not baseline_timing["seconds"]:
+                continue
+            ratio = timing["seconds"] / baseline_timing["seconds"]
+            rows.append(
+                {
+                    "case": case["name"],
+                    "stage": stage,
+                    "seconds": timing["seconds"],
+                    "baseline_seconds": baseline_timing["seconds"],
+                    "ratio": round(ratio, 3),
+                    "regression": ratio > 1 + tolerance,
+                }
+            )
+    return rows
+
+
+def format_comparison(rows):
+    lines = [f"{'case':<24} {'stage':<14} {'seconds':>9} {'baseline':>9} {'ratio':>7}"]
+    for row in rows:
+        lines.append(
+            f"{row['case']:<24} {row['stage']:<14} {row['seconds']:>9.3f} "
+            f"{row['baseline_seconds']:>9.3f} {row['ratio']:>7.2f}"
+            f"{'  REGRESSION' if row['regression'] else ''}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("results")
+    parser.add_argument("baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    with open(args.results) as f:
+        results = json.load(f)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows = compare_results(results, baseline, args.tolerance)
+    print(format_comparison(rows))
+    if any(row["regression"] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
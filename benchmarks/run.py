@@ -0,0 +1,235 @@
+"""Stage level benchmark of the inference pipeline on synthetic plate videos.
+
+    python -m benchmarks.run --preset quick --output benchmarks/results/latest.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+
+Every case renders a deterministic video, then times decode, YOLO, OCR,
+annotation, cv2.VideoWriter, reencode_video_ffmpeg and the S3 upload
+separately. OCR and annotation run on the ground truth boxes, so their
+timings don't depend on what YOLO happens to find in synthetic frames.
+The upload only runs against a local S3 stand-in (S3_ENDPOINT_URL set).
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import cv2
+from app.core.InferenceManager import InferenceManager
+from app.core.s3_utils import upload_video_to_s3
+from benchmarks.compare import compare_results, format_comparison
+from benchmarks.synthetic import generate_video
+
+RESOLUTIONS = {"360p": (640, 360), "720p": (1280, 720), "1080p": (1920, 1080)}
+
+PRESETS = {
+    "quick": [("360p", 3, 1)],
+    "full": [
+        (resolution, seconds, plates)
+        for resolution in RESOLUTIONS
+        for seconds in (5, 20)
+        for plates in (1, 4)
+    ],
+}
+
+
+class StageTimer:
+    def __init__(self):
+        self.seconds = defaultdict(float)
+
+    @contextmanager
+    def measure(self, stage):
+        start = time.perf_counter()
+        yield
+        self.seconds[stage] += time.perf_counter() - start
+
+
+def benchmark_case(manager, resolution, seconds, plates, work_dir, bucket_name):
+    width, height = RESOLUTIONS[resolution]
+    name = f"{resolution}_{seconds}s_{plates}plates"
+    video_path = os.path.join(work_dir, f"{name}.mp4")
+    written_path = os.path.join(work_dir, f"{name}_written.mp4")
+    reencoded_path = os.path.join(work_dir, f"{name}_reencoded.mp4")
+    ground_truth = generate_video(video_path, width, height, seconds, plates=plates)
+
+    timer = StageTimer()
+    detection_area = {"x": 0, "y": 0, "width": width, "height": height}
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    writer = cv2.VideoWriter(
+        written_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height)
+    )
+    frame_count = 0
+    detected_boxes = 0
+    while True:
+        with timer.measure("decode"):
+            frames = manager._read_frames(cap, manager.detection_batch_size)
+        if not frames:
+            break
+        truth = ground_truth[frame_count : frame_count + len(frames)]
+        frame_count += len(frames)
+
+        with timer.measure("yolo"):
+            frame_boxes = manager._detect_plate_boxes(frames, detection_area)
+        detected_boxes += sum(len(boxes) for boxes in frame_boxes)
+
+        crops = [
+            manager._crop_plate(frame, box)
+            for frame, frame_truth in zip(frames, truth)
+            for box, _ in frame_truth
+        ]
+        with timer.measure("ocr"):
+            manager.recognize_plates(crops)
+
+        for frame, frame_truth in zip(frames, truth):
+            detections = [
+                {"bounding_box": box, "plate_number": plate_number}
+                for box, plate_number in frame_truth
+            ]
+            with timer.measure("annotate"):
+                manager._annotate_frame(frame, detections)
+            with timer.measure("video_writer"):
+                writer.write(frame)
+    cap.release()
+    with timer.measure("video_writer"):
+        writer.release()
+
+    with timer.measure("reencode"):
+        manager.reencode_video_ffmpeg(written_path, reencoded_path)
+    output_bytes = os.path.getsize(reencoded_path)
+
+    if bucket_name:
+        with timer.measure("upload"):
+            upload_video_to_s3(reencoded_path, bucket_name, f"benchmarks/{name}.mp4")
+
+    stages = {
+        stage: {
+            "seconds": round(elapsed, 4),
+            "frames_per_second": round(frame_count / elapsed, 2) if elapsed else None,
+        }
+        for stage, elapsed in timer.seconds.items()
+    }
+    if "upload" in stages:
+        stages["upload"]["megabytes_per_second"] = round(
+            output_bytes / 1e6 / timer.seconds["upload"], 2
+        )
+    # reencode_video_ffmpeg already deleted written_path
+    for path in (video_path, written_path, reencoded_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    return {
+        "name": name,
+        "width": width,
+        "height": height,
+        "frames": frame_count,
+        "plates_per_frame": plates,
+        "ocr_crops": sum(len(frame_truth) for frame_truth in ground_truth),
+        "yolo_boxes": detected_boxes,
+        "output_bytes": output_bytes,
+        "stages": stages,
+    }
+
+
+def run(preset, repeat, bucket_name):
+    start = time.perf_counter()
+    manager = InferenceManager()
+    model_load = time.perf_counter() - start
+    start = time.perf_counter()
+    manager.warmup()
+    warmup = time.perf_counter() - start
+
+    cases = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for resolution, seconds, plates in PRESETS[preset]:
+            runs = [
+                benchmark_case(
+                    manager, resolution, seconds, plates, work_dir, bucket_name
+                )
+                for _ in range(repeat)
+            ]
+            cases.append(fastest_per_stage(runs))
+            print(f"{cases[-1]['name']}: {cases[-1]['stages']}", file=sys.stderr)
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "preset": preset,
+        "repeat": repeat,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "opencv": cv2.__version__,
+        },
+        "settings": {
+            "detection_batch_size": manager.detection_batch_size,
+            "ocr_mode": manager.ocr_mode,
+            "ocr_cache": manager.ocr_cache is not None,
+        },
+        "model_load_seconds": round(model_load, 4),
+        "warmup_seconds": round(warmup, 4),
+        "cases": cases,
+    }
+
+
+def fastest_per_stage(runs):
+    """The first run with every stage replaced by its fastest repetition, which is
+    the least noisy estimate on a shared machine"""
+    case = runs[0]
+    for stage in case["stages"]:
+        case["stages"][stage] = min(
+            (run["stages"][stage] for run in runs), key=lambda s: s["seconds"]
+        )
+    return case
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--preset", choices=PRESETS, default="quick")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="benchmarks/results/latest.json")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.15,
+        help="Allowed slowdown of a stage against the baseline, 0.15 is 15%%",
+    )
+    parser.add_argument("--save-baseline", help="Also write the results here")
+    args = parser.parse_args()
+
+    # only ever upload to a local stand-in, never to the production bucket
+    bucket_name = (
+        os.getenv("BENCHMARK_BUCKET", os.getenv("BUCKET_NAME"))
+        if os.getenv("S3_ENDPOINT_URL")
+        else None
+    )
+    results = run(args.preset, max(1, args.repeat), bucket_name)
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparison = compare_results(results, baseline, args.tolerance)
+        print(format_comparison(comparison))
+        if any(row["regression"] for row in comparison):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
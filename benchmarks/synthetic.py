@@ -0,0 +1,71 @@
+import random
+import string
+import cv2
+import numpy as np
+
+
+def random_plate_number(rng):
+    letters = "".join(rng.choice(string.ascii_uppercase) for _ in range(3))
+    digits = "".join(rng.choice(string.digits) for _ in range(4))
+    return f"{letters}{digits}"
+
+
+def render_plate(plate_number, width, height):
+    """White plate with a black border and the plate number in black"""
+    plate = np.full((height, width, 3), 255, dtype=np.uint8)
+    border = max(1, height // 12)
+    cv2.rectangle(plate, (0, 0), (width - 1, height - 1), (0, 0, 0), border)
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    thickness = max(1, height // 10)
+    (text_width, text_height), _ = cv2.getTextSize(plate_number, font, 1, thickness)
+    scale = min(0.8 * width / text_width, 0.6 * height / text_height)
+    (text_width, text_height), _ = cv2.getTextSize(plate_number, font, scale, thickness)
+    origin = ((width - text_width) // 2, (height + text_height) // 2)
+    cv2.putText(plate, plate_number, origin, font, scale, (0, 0, 0), thickness)
+    return plate
+
+
+def generate_video(path, width, height, seconds, fps=30, plates=1, seed=0):
+    """Write an mp4v video of plates moving across a noisy background.
+
+    The output only depends on the arguments, so every run benchmarks the
+    same frames. Returns the ground truth of every frame as a list of
+    (bounding box, plate number) pairs.
+    """
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    background = np_rng.integers(60, 120, size=(height, width, 3), dtype=np.uint8)
+
+    plate_width = max(40, width // 8)
+    plate_height = max(10, plate_width // 4)
+    moving_plates = []
+    for _ in range(plates):
+        plate_number = random_plate_number(rng)
+        moving_plates.append(
+            {
+                "plate_number": plate_number,
+                "image": render_plate(plate_number, plate_width, plate_height),
+                "x": rng.randrange(1, width - plate_width - 1),
+                "y": rng.randrange(1, height - plate_height - 1),
+                "speed": rng.choice([-1, 1]) * rng.randint(2, max(3, width // 100)),
+            }
+        )
+
+    writer = cv2.VideoWriter(
+        path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height)
+    )
+    ground_truth = []
+    x_range = width - plate_width - 2
+    for frame_number in range(int(seconds * fps)):
+        frame = background.copy()
+        frame_truth = []
+        for plate in moving_plates:
+            x = 1 + (plate["x"] + plate["speed"] * frame_number) % x_range
+            y = plate["y"]
+            frame[y : y + plate_height, x : x + plate_width] = plate["image"]
+            box = (x, y, plate_width, plate_height)
+            frame_truth.append((box, plate["plate_number"]))
+        writer.write(frame)
+        ground_truth.append(frame_truth)
+    writer.release()
+    return ground_truth
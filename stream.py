@@ -0,0 +1,49 @@
+import argparse
+import json
+import logging
+import signal
+import sys
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.core.model_registry import model_registry
+
+
+def print_readings(frame_number, readings):
+    for reading in readings:
+        print(json.dumps(reading), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Detect plates on a live video source, printing readings as JSON lines"
+    )
+    parser.add_argument(
+        "source", help="Camera index, video file, named pipe or stream URL"
+    )
+    parser.add_argument(
+        "--max-seconds", type=float, default=None, help="Stop after this many seconds"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    # Ctrl+C stops the stream cleanly so the latency report is still printed
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+    inference_manager = model_registry.get_inference_manager()
+    stats = inference_manager.process_stream(
+        args.source,
+        print_readings,
+        max_seconds=args.max_seconds,
+        stop_event=stop_event,
+    )
+    if stats is None:
+        sys.exit(1)
+    print(json.dumps(stats), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()